@@ -0,0 +1,193 @@
+import argparse
+import json
+import platform
+import random
+import string
+import subprocess
+import time
+import numpy as np
+import sklearn
+from Features import SUSPICIOUS_WORDS, extract_features, extract_features_batch
+from Memory import PeakMemory, max_rss
+from Predict import lookup_domain, predict_proba, scale_features, score_batch, score_url
+from Resources import load_resources
+from VerdictCache import VerdictCache
+
+# Répartition par défaut du corpus synthétique
+DEFAULT_MIX = {"allowlisted": 0.3, "ip": 0.1, "long_path": 0.2, "keyword": 0.2, "random": 0.2}
+RESULTS_PATH = "benchmark_results.json"
+
+# Hôtes inventés pour les URLs hors liste blanche
+TLDS = ["com", "net", "org", "xyz", "info", "top", "co.uk", "ru"]
+
+def _word(rng, low=3, high=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+def _host(rng):
+    labels = [_word(rng) for _ in range(rng.randint(1, 3))]
+    return ".".join(labels + [rng.choice(TLDS)])
+
+def _path(rng, segments):
+    return "/".join(_word(rng, 2, 12) for _ in range(segments))
+
+def make_url(kind, rng, legitimate_domains):
+    """ Une URL synthétique du type demandé """
+    scheme = rng.choice(["http", "https"])
+    if kind == "allowlisted":
+        domain = legitimate_domains[rng.randrange(len(legitimate_domains))]
+        prefix = rng.choice(["", "www.", "mail.", "cdn."])
+        return f"{scheme}://{prefix}{domain}/{_path(rng, rng.randint(0, 3))}"
+    if kind == "ip":
+        ip = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+        return f"{scheme}://{ip}/{_path(rng, rng.randint(1, 4))}"
+    if kind == "long_path":
+        query = "&".join(f"{_word(rng, 2, 6)}={_word(rng, 4, 20)}" for _ in range(rng.randint(2, 8)))
+        return f"{scheme}://{_host(rng)}/{_path(rng, rng.randint(10, 30))}?{query}"
+    if kind == "keyword":
+        words = "-".join(rng.choice(SUSPICIOUS_WORDS) for _ in range(rng.randint(2, 5)))
+        return f"{scheme}://{words}.{_host(rng)}/{rng.choice(SUSPICIOUS_WORDS)}/{_path(rng, 2)}"
+    return f"{scheme}://{_host(rng)}/{_path(rng, rng.randint(0, 4))}"
+
+def make_corpus(size, mix=DEFAULT_MIX, legitimate_domains=(), seed=42):
+    """ Corpus reproductible : même taille, même répartition et même graine = mêmes URLs """
+    rng = random.Random(seed)
+    kinds = [kind for kind in mix if mix[kind] > 0 and (kind != "allowlisted" or len(legitimate_domains))]
+    weights = [mix[kind] for kind in kinds]
+    return [make_url(kind, rng, legitimate_domains) for kind in rng.choices(kinds, weights, k=size)]
+
+def parse_mix(text):
+    """ "allowlisted=0.3,ip=0.1,..." -> dictionnaire de proportions """
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"❌ Type d'URL inconnu : {kind} (attendus : {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight)
+    return mix
+
+def latency_stats(samples_ns):
+    """ Percentiles de latence en microsecondes """
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000
+    return {
+        "calls": int(len(samples)),
+        "mean_us": float(samples.mean()),
+        "p50_us": float(np.percentile(samples, 50)),
+        "p90_us": float(np.percentile(samples, 90)),
+        "p99_us": float(np.percentile(samples, 99)),
+        "max_us": float(samples.max()),
+    }
+
+def time_calls(function, inputs):
+    """ Latence de chaque appel, en nanosecondes """
+    samples = []
+    for item in inputs:
+        start = time.perf_counter_ns()
+        function(item)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+def time_batch(function, urls, batch_size):
+    """ Débit par lot (URLs par seconde) """
+    start = time.perf_counter()
+    for i in range(0, len(urls), batch_size):
+        function(urls[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {"batch_size": batch_size, "seconds": elapsed, "urls_per_second": len(urls) / elapsed if elapsed > 0 else 0.0}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(size=10_000, mix=DEFAULT_MIX, seed=42, batch_size=1_000, latency_calls=2_000):
+    """ Mesurer chaque étape du chemin de prédiction sur un corpus synthétique """
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        resources = load_resources()
+        load_seconds = time.perf_counter() - start
+
+        legitimate_domains = resources["legitimate_domains"]
+        urls = make_corpus(size, mix, legitimate_domains, seed)
+        sample = urls[:latency_calls]
+        feature_names = resources["feature_names"]
+        rows = [extract_features(url, feature_names) for url in sample]
+
+        stages = {
+            "allowlist_lookup": time_calls(lambda url: lookup_domain(url, resources), sample),
+            "extract_features": time_calls(lambda url: extract_features(url, feature_names), sample),
+            "scaler_transform": time_calls(lambda row: scale_features(resources["scaler"], row), rows),
+            "model_predict": time_calls(lambda row: predict_proba(resources, row), rows),
+            "score_url": time_calls(lambda url: score_url(url, resources, cache=None), sample),
+        }
+        # Deuxième passage sur les mêmes URLs : toutes servies par le cache
+        cache = VerdictCache()
+        for url in sample:
+            score_url(url, resources, cache=cache)
+        stages["score_url_cached"] = time_calls(lambda url: score_url(url, resources, cache=cache), sample)
+
+        throughput = {
+            "extract_features_batch": time_batch(lambda batch: extract_features_batch(batch, feature_names), urls, batch_size),
+            "score_batch": time_batch(lambda batch: score_batch(batch, resources, cache=None), urls, batch_size),
+        }
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+        },
+        "model_version": resources.get("version"),
+        "corpus": {"size": size, "mix": mix, "seed": seed},
+        "load_seconds": load_seconds,
+        "latency": {name: latency_stats(samples) for name, samples in stages.items()},
+        "throughput": throughput,
+        "memory": {
+            "peak_rss_mb": memory.peak_mb,
+            "max_rss_mb": max_rss() / 2**20 if max_rss() is not None else None,
+        },
+    }
+
+def print_report(results, baseline=None):
+    """ Résumé lisible, avec l'écart par rapport à une mesure précédente si fournie """
+    def change(value, old):
+        return f" ({(value - old) / old * 100:+.1f}%)" if old else ""
+
+    print(f"📊 {'Étape':<20} {'p50':>10} {'p90':>10} {'p99':>10}")
+    for name, stats in results["latency"].items():
+        old = (baseline or {}).get("latency", {}).get(name, {}).get("p50_us")
+        print(
+            f"   {name:<20} {stats['p50_us']:>8.1f}µs {stats['p90_us']:>8.1f}µs {stats['p99_us']:>8.1f}µs"
+            f"{change(stats['p50_us'], old)}"
+        )
+    for name, stats in results["throughput"].items():
+        old = (baseline or {}).get("throughput", {}).get(name, {}).get("urls_per_second")
+        print(f"⏱️ {name} : {stats['urls_per_second']:.0f} URLs/s par lot de {stats['batch_size']}{change(stats['urls_per_second'], old)}")
+    if results["memory"]["peak_rss_mb"] is not None:
+        print(f"💾 Mémoire résidente max : {results['memory']['peak_rss_mb']:.0f} Mo")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure des performances : extraction, allowlist, modèle, prédiction complète")
+    parser.add_argument("--size", type=int, default=10_000, help="Nombre d'URLs du corpus synthétique")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Répartition, ex. allowlisted=0.3,ip=0.1,long_path=0.2,keyword=0.2,random=0.2")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--latency-calls", type=int, default=2_000, help="Nombre d'appels mesurés un par un par étape")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Fichier JSON des résultats")
+    parser.add_argument("--compare", metavar="JSON", help="Résultats précédents à comparer")
+    args = parser.parse_args()
+
+    results = run(args.size, args.mix, args.seed, args.batch_size, args.latency_calls)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(results, baseline)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"✅ Résultats enregistrés dans {args.output}")
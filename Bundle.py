@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import types
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from Features import IP_PATTERN, SUSPICIOUS_WORDS, feature_order
+from Forest import CompactForest, file_digest, flatten_forest, fold_scaler
+from Storage import FEATURE_DTYPES
+
+# Paquet de modèle versionné produit par TrainModel.py
+BUNDLE_DIR = "model_bundle"
+BUNDLE_FORMAT = 1
+
+# Tableaux de la forêt compacte enregistrés en .npy (projetables en mémoire)
+FOREST_ARRAYS = ["feature", "threshold", "left", "right", "value", "root", "classes"]
+
+def data_digest(X, y):
+    """ Empreinte des données d'entraînement (contenu des colonnes, indépendante du format de fichier) """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(X.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def compact_arrays(model, scaler, feature_names):
+    """ Tableaux de la forêt compacte (scaler absorbé) écrits dans le paquet, None hors forêt aléatoire """
+    if not isinstance(model, RandomForestClassifier):
+        return None
+    # Compteurs et indicateurs : seuils placés entre deux entiers (l'entropie reste réelle)
+    integer_features = [np.dtype(FEATURE_DTYPES.get(name, np.float64)).kind in "biu" for name in feature_names]
+    return fold_scaler(flatten_forest(model), scaler, integer_features)
+
+def write_bundle(model, scaler, feature_names, metrics=None, training_data=None, bundle_dir=BUNDLE_DIR):
+    """ Écrire le paquet : manifeste + forêt compacte (scaler absorbé, forêts aléatoires seulement)
+        + scaler + model.pkl pour les gros lots """
+    tmp_dir = bundle_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, "scaler"))
+
+    forest_info = None
+    arrays = compact_arrays(model, scaler, feature_names)
+    if arrays is not None:
+        os.makedirs(os.path.join(tmp_dir, "forest"))
+        for name in FOREST_ARRAYS:
+            np.save(os.path.join(tmp_dir, "forest", f"{name}.npy"), arrays[name])
+        forest_info = {
+            "max_depth": int(arrays["max_depth"]),
+            "n_features": int(arrays["n_features"]),
+            "n_nodes": int(len(arrays["feature"])),
+            "n_trees": int(len(arrays["root"])),
+            "raw_input": True,
+        }
+    np.save(os.path.join(tmp_dir, "scaler", "mean.npy"), scaler.mean_)
+    np.save(os.path.join(tmp_dir, "scaler", "scale.npy"), scaler.scale_)
+    joblib.dump(model, os.path.join(tmp_dir, "model.pkl"))
+
+    files = {}
+    for folder, _, names in os.walk(tmp_dir):
+        for name in names:
+            path = os.path.join(folder, name)
+            files[os.path.relpath(path, tmp_dir).replace(os.sep, "/")] = file_digest(path)
+
+    model_digest = files["model.pkl"]
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": time.strftime("%Y%m%d-%H%M%S", time.gmtime()) + "-" + model_digest[:8],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "feature_names": list(feature_names),
+        "keywords": SUSPICIOUS_WORDS,
+        "ip_pattern": IP_PATTERN,
+        "estimator": type(model).__name__,
+        "classes": np.asarray(model.classes_).tolist(),
+        "training_data": training_data,
+        "metrics": metrics or {},
+        "forest": forest_info,
+        "files": files,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    # Échange du dossier complet : un lecteur voit l'ancien paquet ou le nouveau, jamais un mélange
+    old_dir = bundle_dir + ".old"
+    if os.path.exists(bundle_dir):
+        os.replace(bundle_dir, old_dir)
+    os.replace(tmp_dir, bundle_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"✅ Paquet de modèle {manifest['version']} sauvegardé sous {bundle_dir}")
+    return manifest
+
+def read_manifest(bundle_dir=BUNDLE_DIR):
+    with open(os.path.join(bundle_dir, "manifest.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+def check_compatible(manifest):
+    """ Refuser un paquet entraîné avec d'autres caractéristiques que celles calculées par ce code """
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"❌ Format de paquet {manifest.get('format')} non supporté (attendu : {BUNDLE_FORMAT})")
+    feature_order(manifest["feature_names"])
+    if manifest["keywords"] != SUSPICIOUS_WORDS:
+        raise ValueError("❌ Mots-clés du paquet différents de suspicious_words.txt : réentraîner le modèle")
+    if manifest["ip_pattern"] != IP_PATTERN:
+        raise ValueError("❌ Expression des adresses IP différente de celle du paquet : réentraîner le modèle")
+
+def verify_files(bundle_dir=BUNDLE_DIR, manifest=None):
+    """ Comparer les empreintes SHA-256 des fichiers du paquet au manifeste, liste des fichiers corrompus """
+    manifest = manifest or read_manifest(bundle_dir)
+    return [
+        name for name, digest in manifest["files"].items()
+        if not os.path.exists(os.path.join(bundle_dir, name)) or file_digest(os.path.join(bundle_dir, name)) != digest
+    ]
+
+class LazyModel:
+    """ Modèle sklearn chargé seulement au premier gros lot (les petits passent par la forêt compacte).
+        Le fichier est ouvert dès la création : après l'échange du dossier par un nouveau paquet,
+        le descripteur désigne toujours le model.pkl de cette version. """
+
+    def __init__(self, path, digest, classes):
+        self.path = path
+        self.digest = digest
+        self.classes_ = classes
+        self._file = open(path, "rb")
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    data = self._read()
+                    if hashlib.sha256(data).hexdigest() != self.digest:
+                        raise ValueError(f"❌ {self.path} ne correspond pas au manifeste du paquet")
+                    start = time.perf_counter()
+                    self._model = joblib.load(io.BytesIO(data))
+                    self._file.close()
+                    print(f"✅ Modèle sklearn chargé en {time.perf_counter() - start:.2f} s", file=sys.stderr)
+        return self._model
+
+    def _read(self):
+        """ Contenu du fichier ouvert ; pread ne dépend pas de la position partagée avec les processus forkés """
+        if hasattr(os, "pread"):
+            return os.pread(self._file.fileno(), os.fstat(self._file.fileno()).st_size, 0)
+        self._file.seek(0)
+        return self._file.read()
+
+    def predict_proba(self, X):
+        return self.load().predict_proba(X)
+
+    def predict(self, X):
+        return self.load().predict(X)
+
+def load_bundle(bundle_dir=BUNDLE_DIR):
+    """ Ouvrir le paquet : manifeste validé, tableaux projetés en mémoire, modèle sklearn différé """
+    start = time.perf_counter()
+    manifest = read_manifest(bundle_dir)
+    check_compatible(manifest)
+
+    # Forêt compacte projetée en mémoire ; absente pour les autres estimateurs (modèle sklearn seul)
+    forest = None
+    info = manifest["forest"]
+    if info is not None:
+        arrays = {
+            name: np.load(os.path.join(bundle_dir, "forest", f"{name}.npy"), mmap_mode="r")
+            for name in FOREST_ARRAYS
+        }
+        if len(arrays["feature"]) != info["n_nodes"] or len(arrays["root"]) != info["n_trees"]:
+            raise ValueError(f"❌ Tableaux de la forêt incohérents avec le manifeste de {bundle_dir}")
+        arrays.update(
+            max_depth=info["max_depth"], n_features=info["n_features"], raw_input=info["raw_input"],
+            model_digest=manifest["files"]["model.pkl"],
+        )
+        forest = CompactForest(arrays)
+    classes = np.asarray(manifest["classes"]) if "classes" in manifest else forest.classes_
+
+    scaler = types.SimpleNamespace(
+        mean_=np.load(os.path.join(bundle_dir, "scaler", "mean.npy"), mmap_mode="r"),
+        scale_=np.load(os.path.join(bundle_dir, "scaler", "scale.npy"), mmap_mode="r"),
+    )
+    model = LazyModel(os.path.join(bundle_dir, "model.pkl"), manifest["files"]["model.pkl"], classes)
+
+    return {
+        "manifest": manifest,
+        "version": manifest["version"],
+        "model": model,
+        "forest": forest,
+        "scaler": scaler,
+        "feature_names": manifest["feature_names"],
+        "load_seconds": time.perf_counter() - start,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Créer ou vérifier le paquet de modèle versionné")
+    parser.add_argument("--bundle", default=BUNDLE_DIR)
+    parser.add_argument("--from-legacy", action="store_true", help="Empaqueter model.pkl, scaler.pkl et feature_names.pkl existants")
+    args = parser.parse_args()
+
+    if args.from_legacy:
+        write_bundle(
+            joblib.load("model.pkl"), joblib.load("scaler.pkl"), joblib.load("feature_names.pkl"),
+            bundle_dir=args.bundle,
+        )
+
+    bundle = load_bundle(args.bundle)
+    corrupted = verify_files(args.bundle, bundle["manifest"])
+    if corrupted:
+        print(f"❌ Fichiers modifiés ou absents : {', '.join(corrupted)}")
+        sys.exit(1)
+    print(f"✅ Paquet {bundle['version']} valide, ouvert en {bundle['load_seconds'] * 1000:.1f} ms")
+    print(json.dumps({key: bundle["manifest"][key] for key in ["feature_names", "training_data", "metrics"]}, indent=2))
@@ -1,51 +1,164 @@
-import requests
+import argparse
+import json
+import os
 import pandas as pd
+import requests
+from KnownBad import KNOWN_BAD_DIR, update_index
+from Storage import DATASET_SCHEMA, LABEL_DTYPE, TableWriter
 
 # 1-Nouvelle source d'URLs de phishing
 URLHAUS_URL = "https://urlhaus.abuse.ch/downloads/csv_recent/"
+PHISHING_PATH = "phishing_urls.csv"
 
-def download_phishing_urls():
-    response = requests.get(URLHAUS_URL)
-    if response.status_code == 200:
-        with open("phishing_urls.csv", "wb") as file:
-            file.write(response.content)
-        print("✅ Fichier phishing_urls.csv téléchargé avec succès !")
-    else:
-        print(f"❌ Erreur {response.status_code} lors du téléchargement des données.")
+# 2-Source des URLs légitimes
+LEGITIMATE_URL = "https://downloads.majestic.com/majestic_million.csv"
+LEGITIMATE_PATH = "legitimate_urls.csv"
 
-# Télécharger les URLs de phishing
-download_phishing_urls()
+DATASET_PATH = "dataset_urls.parquet"
 
-# Télécharger les URLs de phishing
-download_phishing_urls()
+# Taille des blocs lus sur le réseau et des lots de lignes écrits dans le dataset
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+PARSE_CHUNK_SIZE = 100_000
 
-# 2-Charger les URLs légitimes 
-LEGITIMATE_URL = "https://downloads.majestic.com/majestic_million.csv"
+def _load_meta(meta_path):
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as file:
+            return json.load(file)
+    return {}
 
-def download_legitimate_urls():
-    response = requests.get(LEGITIMATE_URL)
-    if response.status_code == 200:
-        with open("legitimate_urls.csv", "wb") as file:
-            file.write(response.content)
-        print("✅ Fichier legitimate_urls.csv téléchargé avec succès !")
-    else:
-        print(f"❌ Erreur {response.status_code} lors du téléchargement des données.")
+def _save_meta(meta_path, meta):
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+
+def _finish(path, part_path, meta_path, meta, resumed):
+    """ Remplacer le fichier par le téléchargement complet et garder ses validateurs """
+    os.replace(part_path, path)
+    meta = {
+        "etag": meta.pop("part_etag", None),
+        "last_modified": meta.pop("part_last_modified", None),
+    }
+    _save_meta(meta_path, meta)
+
+    action = "repris" if resumed else "téléchargé"
+    print(f"✅ Fichier {path} {action} avec succès !")
+    return True
+
+def download(url, path, chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=60):
+    """ Télécharger un fichier en streaming : requête conditionnelle, reprise d'un téléchargement partiel.
+        Retourne True si le fichier a changé, False sinon. """
+    part_path = path + ".part"
+    meta_path = path + ".meta.json"
+    meta = _load_meta(meta_path)
+    headers = {}
+
+    resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = meta.get("part_etag") or meta.get("part_last_modified")
+    if resume_from and not validator:
+        # Sans If-Range, une source modifiée serait recollée à des octets périmés : on repart de zéro
+        os.remove(part_path)
+        resume_from = 0
+    if resume_from:
+        # Reprise : If-Range garantit qu'on ne recolle pas deux versions différentes
+        headers["Range"] = f"bytes={resume_from}-"
+        headers["If-Range"] = validator
+    elif os.path.exists(path):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            print(f"✅ {path} est déjà à jour.")
+            return False
 
-# Télécharger les URLs légitimes
-download_legitimate_urls()
+        if response.status_code == 416 and resume_from:
+            # Le fichier partiel est déjà complet (coupure juste avant le remplacement) ou invalide
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total == str(resume_from):
+                return _finish(path, part_path, meta_path, meta, resumed=True)
+            os.remove(part_path)
+            print(f"⚠️ Reprise impossible pour {path} : nouveau téléchargement complet.")
+            return download(url, path, chunk_size, timeout)
 
-# 3-Charger les URLs de phishing
-df_phishing = pd.read_csv("phishing_urls.csv", skiprows=9, usecols=[2], names=["url"])
-df_phishing["label"] = 1  # Phishing
+        if response.status_code == 206:
+            mode = "ab"
+        elif response.status_code == 200:
+            mode = "wb"
+            resume_from = 0
+        else:
+            print(f"❌ Erreur {response.status_code} lors du téléchargement de {url}.")
+            return False
 
-# Charger les URLs légitimes
-df_legit = pd.read_csv("legitimate_urls.csv", usecols=[2], names=["url"])
-df_legit["label"] = 0  # Légitime
+        # Validateurs gardés avant le transfert pour pouvoir reprendre en cas de coupure
+        if mode == "wb":
+            meta["part_etag"] = response.headers.get("ETag")
+            meta["part_last_modified"] = response.headers.get("Last-Modified")
+            _save_meta(meta_path, meta)
 
-# Fusionner les deux datasets
-df = pd.concat([df_phishing, df_legit], ignore_index=True)
+        with open(part_path, mode) as file:
+            for block in response.iter_content(chunk_size=chunk_size):
+                file.write(block)
+
+    return _finish(path, part_path, meta_path, meta, resumed=bool(resume_from))
+
+def normalize_urls(urls):
+    """ Nettoyer une série d'URLs : valeurs manquantes et espaces superflus """
+    urls = urls.dropna().astype(str).str.strip()
+    return urls[urls != ""]
+
+def iter_phishing_urls(path=PHISHING_PATH, chunksize=PARSE_CHUNK_SIZE):
+    """ URLs de phishing (colonne url du CSV URLhaus), par lots """
+    for chunk in pd.read_csv(path, skiprows=9, usecols=[2], names=["url"], dtype=str, chunksize=chunksize):
+        yield normalize_urls(chunk["url"])
+
+def iter_legitimate_urls(path=LEGITIMATE_PATH, chunksize=PARSE_CHUNK_SIZE):
+    """ Domaines légitimes (colonne Domain du Majestic Million), par lots """
+    for chunk in pd.read_csv(path, usecols=["Domain"], dtype=str, chunksize=chunksize):
+        yield normalize_urls(chunk["Domain"])
+
+def build_dataset(phishing_path=PHISHING_PATH, legitimate_path=LEGITIMATE_PATH, output_path=DATASET_PATH, chunksize=PARSE_CHUNK_SIZE):
+    """ Écrire le dataset lot par lot (Parquet, ou CSV pour l'export), sans charger les deux sources en mémoire """
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.tmp{ext}"
+    counts = {1: 0, 0: 0}
+    sources = [
+        (iter_phishing_urls(phishing_path, chunksize), 1),  # Phishing
+        (iter_legitimate_urls(legitimate_path, chunksize), 0),  # Légitime
+    ]
+    with TableWriter(tmp_path, DATASET_SCHEMA) as writer:
+        for chunks, label in sources:
+            for urls in chunks:
+                writer.write(pd.DataFrame({"url": urls, "label": LABEL_DTYPE(label)}))
+                counts[label] += len(urls)
+    os.replace(tmp_path, output_path)
+
+    print(f"✅ Dataset complet enregistré sous {output_path} ! ({counts[1]} phishing, {counts[0]} légitimes)")
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collecte des URLs de phishing et légitimes")
+    parser.add_argument("--phishing-url", default=URLHAUS_URL)
+    parser.add_argument("--legitimate-url", default=LEGITIMATE_URL)
+    parser.add_argument("--output", default=DATASET_PATH)
+    parser.add_argument("--chunk-size", type=int, default=PARSE_CHUNK_SIZE, help="Nombre de lignes traitées par lot")
+    parser.add_argument("--known-bad", default=KNOWN_BAD_DIR, help="Index des URLs malveillantes connues mis à jour")
+    parser.add_argument("--max-age-days", type=int, help="Retirer de l'index les URLs absentes du flux depuis ce nombre de jours")
+    args = parser.parse_args(argv)
+
+    # Télécharger les URLs de phishing et les URLs légitimes
+    phishing_changed = download(args.phishing_url, PHISHING_PATH)
+    legitimate_changed = download(args.legitimate_url, LEGITIMATE_PATH)
+
+    # Fusionner les deux sources dans le dataset final (inutile si rien n'a changé)
+    if phishing_changed or legitimate_changed or not os.path.exists(args.output):
+        build_dataset(PHISHING_PATH, LEGITIMATE_PATH, args.output, args.chunk_size)
+    else:
+        print(f"✅ {args.output} est déjà à jour.")
 
-# Sauvegarder le dataset final
-df.to_csv("dataset_urls.csv", index=False)
+    # Index des URLs malveillantes connues : seules les URLs du nouveau flux sont ajoutées (mise à jour quotidienne)
+    if phishing_changed or not os.path.exists(os.path.join(args.known_bad, "manifest.json")):
+        update_index(iter_phishing_urls(PHISHING_PATH, args.chunk_size), "urlhaus", args.known_bad, args.max_age_days)
 
-print("✅ Dataset complet enregistré sous dataset_urls.csv !")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import functools
+import os
+import pathlib
+import threading
+import tldextract
+from tldextract.remote import lenient_netloc
+
+# Liste des suffixes publics embarquée dans le projet : aucun accès réseau, aucun cache disque
+PUBLIC_SUFFIX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
+
+# Nombre d'hôtes gardés en mémoire
+HOST_CACHE_SIZE = 100_000
+
+_lock = threading.Lock()
+_extractor = None
+
+def get_extractor():
+    """ Extracteur unique par processus, construit à partir de la liste embarquée """
+    global _extractor
+    if _extractor is None:
+        with _lock:
+            if _extractor is None:
+                _extractor = tldextract.TLDExtract(
+                    suffix_list_urls=(pathlib.Path(PUBLIC_SUFFIX_PATH).as_uri(),),
+                    cache_dir=None,
+                    fallback_to_snapshot=True,
+                )
+    return _extractor
+
+@functools.lru_cache(maxsize=HOST_CACHE_SIZE)
+def split_host(host):
+    """ Hôte -> (domaine, suffixe), mémorisé pour les hôtes répétés """
+    extracted = get_extractor().extract_str(host)
+    return extracted.domain, extracted.suffix
+
+def url_host(url):
+    """ Hôte de l'URL en minuscules, tel qu'utilisé pour le calcul du domaine """
+    return lenient_netloc(url).lower()
+
+def host_domain(host):
+    """ Domaine principal d'un hôte (ex: "google" et "com" -> google.com) """
+    domain, suffix = split_host(host)
+    return f"{domain}.{suffix}"
+
+def cache_stats():
+    """ Statistiques du cache d'hôtes """
+    info = split_host.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
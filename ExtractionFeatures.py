@@ -1,49 +1,49 @@
+import argparse
+import os
+import time
 import pandas as pd
-import tldextract
-import re
-
-# Charger le dataset
-df = pd.read_csv("dataset_urls.csv")
-
-# Liste de mots-clés suspects souvent utilisés dans le phishing
-suspicious_words = ["login", "verify", "bank", "secure", "account", "update", "free", "password", "signin"]
-
-def extract_features(url):
-    # Longueur totale de l'URL
-    url_length = len(url)
-    
-    # Nombre de points dans l'URL
-    num_dots = url.count('.')
-    
-    # Nombre de tirets (-) dans l'URL
-    num_hyphens = url.count('-')
-    
-    # Nombre de barres obliques (/)
-    num_slashes = url.count('/')
-    
-    # Vérifier si l'URL contient une adresse IP
-    has_ip = bool(re.search(r'\d+\.\d+\.\d+\.\d+', url))
-    
-    # Extraire le domaine
-    extracted = tldextract.extract(url)
-    domain = extracted.domain
-    
-    # Vérifier la présence de mots suspects
-    contains_suspicious_word = any(word in url.lower() for word in suspicious_words)
-
-    return [url_length, num_dots, num_hyphens, num_slashes, has_ip, contains_suspicious_word]
-
-# Appliquer l'extraction sur toutes les URLs
-df_features = df["url"].apply(lambda x: extract_features(str(x)))
-
-# Convertir en DataFrame
-columns = ["url_length", "num_dots", "num_hyphens", "num_slashes", "has_ip", "contains_suspicious_word"]
-df_features = pd.DataFrame(df_features.tolist(), columns=columns)
-
-# Ajouter les labels
-df_features["label"] = df["label"]
-
-# Sauvegarder les features extraites
-df_features.to_csv("dataset_features.csv", index=False)
-
-print("✅ Extraction des caractéristiques terminée et enregistrée dans dataset_features.csv !")
+from Features import ALL_FEATURE_NAMES, FEATURE_NAMES, extract_features_batch
+from Storage import LABEL_DTYPE, TableWriter, cast_features, count_rows, features_schema, iter_table
+
+# Nombre d'URLs traitées par lot : la mémoire utilisée dépend de ce lot, pas de la taille du dataset
+CHUNK_SIZE = 200_000
+
+def extract_file(input_path="dataset_urls.parquet", output_path="dataset_features.parquet", chunksize=CHUNK_SIZE, feature_names=FEATURE_NAMES):
+    """ Extraire les caractéristiques lot par lot et les ajouter au fichier de sortie au fil de l'eau
+        (même scanner que la prédiction, donc mêmes valeurs) """
+    total = count_rows(input_path)
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.tmp{ext}"
+
+    done = 0
+    start = time.perf_counter()
+    with TableWriter(tmp_path, features_schema(feature_names)) as writer:
+        for chunk in iter_table(input_path, chunksize, columns=["url", "label"]):
+            # Appliquer l'extraction vectorisée sur le lot
+            features = extract_features_batch(chunk["url"].tolist(), feature_names)
+
+            # Types compacts (int16 pour les compteurs, booléens pour les indicateurs) et labels
+            df_features = cast_features(pd.DataFrame(features, columns=feature_names))
+            df_features["label"] = chunk["label"].to_numpy(dtype=LABEL_DTYPE)
+            writer.write(df_features)
+
+            done += len(chunk)
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed if elapsed > 0 else 0.0
+            progress = f"{done}/{total} ({done / total * 100:.1f}%)" if total else f"{done}"
+            print(f"⏳ {progress} URLs traitées, {rate:.0f} URLs/s", flush=True)
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Extraction des caractéristiques terminée et enregistrée dans {output_path} ! ({done} URLs en {elapsed:.2f} s)")
+    return done
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction des caractéristiques des URLs, par lots")
+    parser.add_argument("--input", default="dataset_urls.parquet", help="Dataset d'URLs (Parquet, ou CSV)")
+    parser.add_argument("--output", default="dataset_features.parquet", help="Fichier de caractéristiques (Parquet, ou CSV)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Nombre d'URLs traitées par lot")
+    parser.add_argument("--all-features", action="store_true",
+                        help="Ajouter chiffres, ponctuation, profondeur du chemin, longueur de la requête et entropie")
+    args = parser.parse_args()
+    extract_file(args.input, args.output, args.chunk_size, ALL_FEATURE_NAMES if args.all_features else FEATURE_NAMES)
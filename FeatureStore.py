@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from Features import FEATURE_NAMES, IP_PATTERN, SCANNER_VERSION, SUSPICIOUS_WORDS, extract_features_batch
+from Storage import LABEL_DTYPE, cast_column, iter_table
+
+# Magasin de caractéristiques : une colonne .npy typée par caractéristique, triée par hash d'URL
+STORE_DIR = "feature_store"
+DATASET_PATH = "dataset_urls.parquet"
+CHUNK_SIZE = 200_000
+
+def url_hashes(urls):
+    """ Hash 64 bits (blake2b) de chaque URL : la clé du magasin """
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little") for url in urls),
+        dtype=np.uint64,
+        count=len(urls),
+    )
+
+def schema_signature():
+    """ Empreinte de la définition des caractéristiques : si elle change, tout est recalculé """
+    schema = {"features": FEATURE_NAMES, "keywords": SUSPICIOUS_WORDS, "ip_pattern": IP_PATTERN, "scanner": SCANNER_VERSION}
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+def load_store(store_dir=STORE_DIR, mmap_mode="r"):
+    """ Ouvrir le magasin (colonnes en mmap), ou None s'il n'existe pas """
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    columns = {
+        name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in ["url_hash", "label"] + manifest["feature_names"]
+    }
+    return {"manifest": manifest, "columns": columns}
+
+def _write_store(store_dir, hashes, labels, features, feature_names):
+    """ Écrire le nouveau magasin à côté de l'ancien puis l'échanger """
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "url_hash.npy"), hashes)
+    np.save(os.path.join(tmp_dir, "label.npy"), labels)
+    for j, name in enumerate(feature_names):
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), cast_column(name, features[:, j]))
+
+    manifest = {"schema": schema_signature(), "feature_names": feature_names, "rows": int(len(hashes))}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    old_dir = store_dir + ".old"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def refresh(dataset_path=DATASET_PATH, store_dir=STORE_DIR, chunksize=CHUNK_SIZE):
+    """ Mettre le magasin à jour : caractéristiques calculées seulement pour les nouvelles URLs,
+        URLs absentes du dataset supprimées """
+    start = time.perf_counter()
+    store = load_store(store_dir)
+    if store is not None and store["manifest"]["schema"] != schema_signature():
+        print("⚠️ Définition des caractéristiques modifiée : recalcul complet.")
+        store = None
+
+    if store is not None:
+        stored_hashes = np.asarray(store["columns"]["url_hash"])
+        stored_features = np.column_stack([store["columns"][name] for name in FEATURE_NAMES]).astype(np.int32)
+    else:
+        stored_hashes = np.empty(0, dtype=np.uint64)
+        stored_features = np.empty((0, len(FEATURE_NAMES)), dtype=np.int32)
+
+    all_hashes, all_labels = [], []
+    new_hashes, new_features = [], []
+    for chunk in iter_table(dataset_path, chunksize, columns=["url", "label"]):
+        urls = chunk["url"].astype(str).tolist()
+        hashes = url_hashes(urls)
+        all_hashes.append(hashes)
+        all_labels.append(chunk["label"].to_numpy(dtype=LABEL_DTYPE))
+
+        # Seules les URLs inconnues du magasin passent par l'extraction
+        todo = np.flatnonzero(~np.isin(hashes, stored_hashes))
+        if len(todo):
+            new_hashes.append(hashes[todo])
+            new_features.append(extract_features_batch([urls[i] for i in todo]).astype(np.int32))
+
+    hashes = np.concatenate(all_hashes) if all_hashes else np.empty(0, dtype=np.uint64)
+    labels = np.concatenate(all_labels) if all_labels else np.empty(0, dtype=LABEL_DTYPE)
+
+    # Une ligne par URL (en cas de doublon, le dernier label l'emporte), triée par hash
+    unique_hashes, last = np.unique(hashes[::-1], return_index=True)
+    labels = labels[::-1][last]
+
+    # Caractéristiques : anciennes conservées, nouvelles ajoutées
+    pool_hashes = np.concatenate([stored_hashes] + new_hashes)
+    pool_features = np.concatenate([stored_features] + new_features) if new_features else stored_features
+    order = np.argsort(pool_hashes, kind="stable")
+    pool_hashes, pool_features = pool_hashes[order], pool_features[order]
+    features = pool_features[np.searchsorted(pool_hashes, unique_hashes)]
+
+    computed = int(len(np.unique(np.concatenate(new_hashes)))) if new_hashes else 0
+    expired = int(len(stored_hashes) - np.isin(stored_hashes, unique_hashes, assume_unique=True).sum())
+    _write_store(store_dir, unique_hashes, labels, features, FEATURE_NAMES)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Magasin {store_dir} à jour en {elapsed:.2f} s : {len(unique_hashes)} URLs, "
+        f"{computed} calculées, {len(unique_hashes) - computed} réutilisées, {expired} expirées"
+    )
+    return {"rows": int(len(unique_hashes)), "computed": computed, "expired": expired, "seconds": elapsed}
+
+def load_training_matrix(store_dir=STORE_DIR, feature_names=FEATURE_NAMES):
+    """ Matrice d'entraînement (X, y) assemblée à partir des colonnes du magasin, projetées en mémoire sans copie """
+    store = load_store(store_dir)
+    if store is None:
+        raise FileNotFoundError(f"❌ Aucun magasin de caractéristiques dans {store_dir}")
+    X = pd.DataFrame({name: store["columns"][name] for name in feature_names}, copy=False)
+    y = pd.Series(store["columns"]["label"], name="label")
+    return X, y
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mise à jour incrémentale du magasin de caractéristiques")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    refresh(args.dataset, args.store, args.chunk_size)
@@ -0,0 +1,183 @@
+import collections
+import math
+import operator
+import re
+import string
+import numpy as np
+import pandas as pd
+from Keywords import get_matcher
+
+# Ordre exact des colonnes utilisé lors de l'entraînement (feature_names.pkl)
+FEATURE_NAMES = ["url_length", "num_dots", "num_hyphens", "num_slashes", "has_ip", "contains_suspicious_word"]
+
+# Caractéristiques supplémentaires calculées par le même parcours de l'URL
+EXTRA_FEATURE_NAMES = [
+    "num_digits", "num_special", "num_at", "num_percent", "num_equals", "num_ampersand",
+    "path_depth", "query_length", "entropy",
+]
+ALL_FEATURE_NAMES = FEATURE_NAMES + EXTRA_FEATURE_NAMES
+
+# Version de l'extraction (à changer si le calcul d'une caractéristique change)
+SCANNER_VERSION = 2
+
+# Mots-clés suspects souvent utilisés dans le phishing (suspicious_words.txt), compilés en automate
+_matcher = get_matcher()
+SUSPICIOUS_WORDS = _matcher.keywords
+
+# Motifs partagés par l'entraînement et la prédiction
+IP_PATTERN = r"\d+\.\d+\.\d+\.\d+"
+
+def keyword_pattern(keywords):
+    """ Alternance des mots-clés, chaque lettre acceptée en minuscule ou en majuscule comme dans l'automate """
+    def char_class(char):
+        upper = char.upper()
+        if upper != char and len(upper) == 1:
+            return f"[{re.escape(char)}{re.escape(upper)}]"
+        return re.escape(char)
+    return "|".join("".join(map(char_class, word)) for word in keywords)
+
+SUSPICIOUS_PATTERN = keyword_pattern(SUSPICIOUS_WORDS)
+
+# \d limité aux chiffres ASCII, comme dans le moteur regex d'Arrow (RE2) utilisé pour les lots
+_ip_regex = re.compile(IP_PATTERN, re.ASCII)
+
+# Ponctuation ASCII autre que les séparateurs déjà comptés (. - /)
+SPECIAL_CHARS = "".join(char for char in string.punctuation if char not in ".-/")
+SPECIAL_PATTERN = "[" + "".join("\\" + char for char in SPECIAL_CHARS) + "]"
+_ZEROS = (0,) * max(len(SPECIAL_CHARS), len(string.digits))
+
+# Caractéristiques qui demandent l'histogramme des caractères de l'URL
+_HISTOGRAM_FEATURES = {"num_digits", "num_special", "num_at", "num_percent", "num_equals", "num_ampersand", "entropy"}
+
+# c * log2(c) précalculé pour les effectifs courants de l'entropie
+_XLOGX = [0.0] + [count * math.log2(count) for count in range(1, 4096)]
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"  # Opérations sur chaînes exécutées en C++ par Arrow
+except ImportError:
+    STRING_DTYPE = object
+
+def feature_order(feature_names):
+    """ Indices des colonnes de ALL_FEATURE_NAMES dans l'ordre demandé """
+    unknown = [name for name in feature_names if name not in ALL_FEATURE_NAMES]
+    if unknown:
+        raise ValueError(f"❌ Caractéristiques inconnues : {unknown}")
+    return [ALL_FEATURE_NAMES.index(name) for name in feature_names]
+
+def url_parts(url):
+    """ Profondeur du chemin (segments non vides) et longueur de la requête (après "?", sans le fragment) """
+    start = url.find("://")
+    start = start + 3 if start >= 0 else 0
+    end = url.find("#", start)
+    if end < 0:
+        end = len(url)
+    query = url.find("?", start, end)
+    path_end = query if query >= 0 else end
+    slash = url.find("/", start, path_end)
+    depth = sum(1 for segment in url[slash:path_end].split("/") if segment) if slash >= 0 else 0
+    return depth, end - query - 1 if query >= 0 else 0
+
+class UrlScanner:
+    """ Toutes les caractéristiques demandées d'une URL, écrites dans une ligne préallouée.
+        Les compteurs viennent d'un seul histogramme des caractères (calculé en C par Counter) ;
+        l'IP et les mots-clés ne sont cherchés que si demandés, l'IP seulement s'il y a assez de points.
+        Chemin d'une URL seule ; les lots ne l'utilisent que pour les caractéristiques sans équivalent en colonne. """
+
+    def __init__(self, feature_names=FEATURE_NAMES):
+        self.feature_names = list(feature_names)
+        requested = set(self.feature_names)
+        self._take = operator.itemgetter(*feature_order(self.feature_names))
+        self._histogram = bool(requested & _HISTOGRAM_FEATURES)
+        self._has_ip = "has_ip" in requested
+        self._keyword = "contains_suspicious_word" in requested
+        self._parts = bool(requested & {"path_depth", "query_length"})
+        self._entropy = "entropy" in requested
+
+    def scan(self, url, out):
+        """ Remplir `out` (vue d'une ligne de matrice) dans l'ordre de feature_names """
+        length = len(url)
+        digits = special = at = percent = equals = ampersand = 0
+        entropy = 0.0
+        if self._histogram:
+            counts = collections.Counter(url)
+            get = counts.get
+            dots, hyphens, slashes = get(".", 0), get("-", 0), get("/", 0)
+            digits = sum(map(get, string.digits, _ZEROS))
+            special = sum(map(get, SPECIAL_CHARS, _ZEROS))
+            at, percent, equals, ampersand = get("@", 0), get("%", 0), get("=", 0), get("&", 0)
+            if self._entropy and length:
+                if length < len(_XLOGX):
+                    total = sum(map(_XLOGX.__getitem__, counts.values()))
+                else:
+                    total = sum(count * math.log2(count) for count in counts.values())
+                entropy = math.log2(length) - total / length
+        else:
+            dots, hyphens, slashes = url.count("."), url.count("-"), url.count("/")
+
+        # Une IP a au moins trois points : inutile de lancer la recherche sinon
+        has_ip = self._has_ip and dots >= 3 and _ip_regex.search(url) is not None
+        keyword = self._keyword and _matcher.contains(url)
+        depth, query_length = url_parts(url) if self._parts else (0, 0)
+
+        out[:] = self._take((
+            length, dots, hyphens, slashes, has_ip, keyword,
+            digits, special, at, percent, equals, ampersand, depth, query_length, entropy,
+        ))
+        return out
+
+_scanners = {}
+
+def get_scanner(feature_names=FEATURE_NAMES):
+    """ Scanner préparé une seule fois par liste de caractéristiques """
+    key = tuple(feature_names)
+    scanner = _scanners.get(key)
+    if scanner is None:
+        scanner = _scanners[key] = UrlScanner(key)
+    return scanner
+
+def extract_features(url, feature_names=FEATURE_NAMES):
+    """ Caractéristiques d'une seule URL, sous forme de matrice (1, n) """
+    row = np.empty((1, len(feature_names)), dtype=np.float64)
+    get_scanner(feature_names).scan(url, row[0])
+    return row
+
+def extract_features_batch(urls, feature_names=FEATURE_NAMES):
+    """ Caractéristiques d'un ensemble d'URLs (liste, tableau ou Series) : les compteurs colonne par colonne,
+        la profondeur du chemin, la requête et l'entropie par le scanner """
+    urls = pd.Series(urls, dtype=object).astype(str)
+    strings = urls.astype(STRING_DTYPE)
+
+    columns = {
+        "url_length": lambda: strings.str.len(),
+        "num_dots": lambda: strings.str.count(r"\."),
+        "num_hyphens": lambda: strings.str.count("-"),
+        "num_slashes": lambda: strings.str.count("/"),
+        "has_ip": lambda: strings.str.contains(IP_PATTERN, regex=True),
+        # Alternance compilée en automate par le moteur regex : une seule passe également
+        "contains_suspicious_word": lambda: (
+            strings.str.contains(SUSPICIOUS_PATTERN, regex=True)
+            if SUSPICIOUS_WORDS else pd.Series(False, index=strings.index)
+        ),
+        "num_digits": lambda: strings.str.count("[0-9]"),
+        "num_special": lambda: strings.str.count(SPECIAL_PATTERN),
+        "num_at": lambda: strings.str.count("@"),
+        "num_percent": lambda: strings.str.count("%"),
+        "num_equals": lambda: strings.str.count("="),
+        "num_ampersand": lambda: strings.str.count("&"),
+    }
+
+    feature_order(feature_names)
+    matrix = np.empty((len(urls), len(feature_names)), dtype=np.float64)
+    for j, name in enumerate(feature_names):
+        if name in columns:
+            matrix[:, j] = columns[name]().to_numpy(dtype=np.float64)
+
+    scanned = [j for j, name in enumerate(feature_names) if name not in columns]
+    if scanned:
+        scan = get_scanner([feature_names[j] for j in scanned]).scan
+        rows = np.empty((len(urls), len(scanned)), dtype=np.float64)
+        for i, url in enumerate(urls.tolist()):
+            scan(url, rows[i])
+        matrix[:, scanned] = rows
+    return matrix
@@ -0,0 +1,180 @@
+import argparse
+import hashlib
+import time
+import numpy as np
+
+# Forêt aplatie exportée par TrainModel.py
+FOREST_PATH = "model_forest.npz"
+
+# Au-delà de cette taille de lot, le parcours Cython de sklearn redevient plus rapide
+COMPACT_MAX_ROWS = 256
+
+def file_digest(path):
+    """ Empreinte SHA-256 d'un fichier (relie la forêt exportée au model.pkl d'origine) """
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _integer_boundary(threshold, mean, scale):
+    """ Plus grand entier v tel que float32((v - mean) / scale) <= threshold, plus 0.5 :
+        pour des caractéristiques entières, la comparaison brute est exactement celle du chemin en deux étapes """
+    v = np.floor(threshold * scale + mean)
+    while np.float32((v + 1 - mean) / scale) <= threshold:
+        v += 1
+    while np.float32((v - mean) / scale) > threshold:
+        v -= 1
+    return v + 0.5
+
+def fold_scaler(arrays, scaler, integer_features=None):
+    """ Absorber le StandardScaler dans les seuils : la forêt prend alors les caractéristiques brutes """
+    threshold = arrays["threshold"].copy()
+    internal = arrays["left"] != np.arange(len(threshold))
+    for node in np.flatnonzero(internal):
+        j = arrays["feature"][node]
+        mean, scale = scaler.mean_[j], scaler.scale_[j]
+        if integer_features is not None and integer_features[j]:
+            threshold[node] = _integer_boundary(threshold[node], mean, scale)
+        else:
+            threshold[node] = threshold[node] * scale + mean
+    return dict(arrays, threshold=threshold, raw_input=np.array(True))
+
+def flatten_forest(model):
+    """ Aplatir les arbres d'un RandomForestClassifier dans des tableaux NumPy contigus """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        leaf = tree.children_left < 0
+        node_ids = np.arange(n_nodes) + offset
+
+        # Une feuille boucle sur elle-même : le parcours vectorisé n'a pas besoin de cas particulier
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold))
+        lefts.append(np.where(leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, node_ids, tree.children_right + offset).astype(np.int32))
+        # Probabilités par classe, déjà normalisées dans tree_.value
+        values.append(tree.value[:, 0, :model.n_classes_])
+        roots.append(offset)
+        offset += n_nodes
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+        "root": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+        "max_depth": np.array(max(e.tree_.max_depth for e in model.estimators_), dtype=np.int32),
+        "n_features": np.array(model.n_features_in_, dtype=np.int32),
+        "raw_input": np.array(False),
+    }
+
+def export_forest(model, path=FOREST_PATH, model_path=None, scaler=None, scaler_path=None, integer_features=None):
+    """ Enregistrer la forêt aplatie (scaler absorbé si fourni), avec l'empreinte des fichiers d'origine """
+    arrays = flatten_forest(model)
+    if scaler is not None:
+        arrays = fold_scaler(arrays, scaler, integer_features)
+    arrays["model_digest"] = np.array(file_digest(model_path) if model_path else "")
+    arrays["scaler_digest"] = np.array(file_digest(scaler_path) if scaler_path else "")
+    np.savez(path, **arrays)
+    print(f"✅ Forêt compacte sauvegardée sous {path}")
+
+class CompactForest:
+    """ Prédicteur léger : parcours vectorisé de tous les arbres sur un lot d'URLs """
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        # Enfants entrelacés (droite, gauche) : un seul accès indexé par étape
+        self.children = np.stack([arrays["right"], arrays["left"]], axis=1).ravel().astype(np.intp)
+        self.value = arrays["value"]
+        self.root = arrays["root"].astype(np.intp)
+        self.classes_ = arrays["classes"]
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features_in_ = int(arrays["n_features"])
+        self.model_digest = str(arrays["model_digest"]) if "model_digest" in arrays else ""
+        self.scaler_digest = str(arrays["scaler_digest"]) if "scaler_digest" in arrays else ""
+        # Vrai si le scaler est absorbé : entrée = caractéristiques brutes
+        self.raw_input = bool(arrays["raw_input"]) if "raw_input" in arrays else False
+
+    def apply(self, X):
+        """ Feuille atteinte dans chaque arbre, tableau (n_arbres, n_lignes) """
+        # Même conversion que sklearn : les seuils sont comparés à des float32
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[None, :]
+        nodes = np.repeat(self.root[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = self.children[nodes * 2 + go_left]
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Somme arbre par arbre puis division, dans le même ordre que sklearn : résultat identique au bit près
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        for tree_leaves in leaves:
+            proba += self.value[tree_leaves]
+        proba /= len(self.root)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def load_forest(path=FOREST_PATH):
+    with np.load(path) as arrays:
+        return CompactForest({name: arrays[name] for name in arrays.files})
+
+def check_identical(model, forest, X, X_raw=None):
+    """ Vérifier que la forêt compacte donne exactement les probabilités de sklearn (scaler + modèle) """
+    forest_input = X_raw if forest.raw_input else X
+    return np.array_equal(model.predict_proba(X), forest.predict_proba(forest_input))
+
+def benchmark(model, scaler, forest, X_raw, repeat=200):
+    """ Latence d'une URL et débit par lot, scaler + sklearn contre forêt compacte """
+    results = {}
+
+    def sklearn_path(X):
+        return model.predict_proba((X - scaler.mean_) / scaler.scale_)
+
+    def compact_path(X):
+        return forest.predict_proba(X if forest.raw_input else (X - scaler.mean_) / scaler.scale_)
+
+    for name, predict in [("sklearn", sklearn_path), ("compacte", compact_path)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predict(X_raw[:1])
+        latency = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        predict(X_raw)
+        throughput = len(X_raw) / (time.perf_counter() - start)
+
+        results[name] = {"latency_ms": latency * 1000, "rows_per_second": throughput}
+        print(f"⏱️ {name:8s} : {latency * 1000:.3f} ms par URL, {throughput:.0f} URLs/s par lot de {len(X_raw)}")
+    return results
+
+if __name__ == "__main__":
+    import joblib
+    from Storage import read_table
+
+    parser = argparse.ArgumentParser(description="Vérifier et mesurer la forêt compacte face au modèle sklearn")
+    parser.add_argument("--model", default="model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--forest", default=FOREST_PATH)
+    parser.add_argument("--features", default="dataset_features.parquet", help="Caractéristiques utilisées pour la mesure")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    forest = load_forest(args.forest)
+
+    df = read_table(args.features).drop(columns=["label"]).head(args.rows)
+    X_raw = df.to_numpy(dtype=np.float64)
+    X = scaler.transform(df)
+
+    print("✅ Probabilités identiques à sklearn" if check_identical(model, forest, X, X_raw) else "❌ Probabilités différentes de sklearn !")
+    benchmark(model, scaler, forest, X_raw)
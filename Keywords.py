@@ -0,0 +1,115 @@
+import collections
+import os
+
+try:
+    import ahocorasick  # pyahocorasick (requirements.txt) : automate compilé en C
+except ImportError:  # Repli en Python pur, mêmes résultats en plus lent
+    ahocorasick = None
+
+# Dictionnaire de mots-clés suspects (un par ligne, "#" pour les commentaires)
+KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suspicious_words.txt")
+
+def load_keywords(path=KEYWORDS_PATH):
+    """ Charger les mots-clés d'un fichier, en minuscules et sans doublons """
+    keywords = []
+    seen = set()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            word = line.split("#", 1)[0].strip().lower()
+            if word and word not in seen:
+                seen.add(word)
+                keywords.append(word)
+    return keywords
+
+class KeywordMatcher:
+    """ Automate Aho-Corasick : une seule passe sur l'URL pour tous les mots-clés, sans tenir compte de la casse """
+
+    def __init__(self, keywords):
+        self.keywords = [word.lower() for word in keywords]
+        if ahocorasick is not None:
+            self._build_native()
+        else:
+            self._build_python()
+
+    def _build_native(self):
+        # Seules les majuscules des lettres des mots-clés sont ramenées en minuscules, comme dans le repli en Python
+        self._fold = str.maketrans({
+            char.upper(): char
+            for word in self.keywords for char in word
+            if char.upper() != char and len(char.upper()) == 1
+        })
+        self._automaton = ahocorasick.Automaton()
+        for index, word in enumerate(self.keywords):
+            self._automaton.add_word(word, index)
+        if self.keywords:
+            self._automaton.make_automaton()
+
+    def _build_python(self):
+        self._automaton = None
+        # Trie : transitions, lien d'échec et mots reconnus pour chaque état
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, word in enumerate(self.keywords):
+            state = 0
+            for char in word:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(index)
+
+        # Liens d'échec calculés en largeur
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+        # Transitions dupliquées en majuscules : pas de copie de l'URL en minuscules
+        for goto in self._goto:
+            for char, child in list(goto.items()):
+                upper = char.upper()
+                if upper != char and len(upper) == 1:
+                    goto[upper] = child
+
+    def _iter_matches(self, text):
+        """ Indices des mots-clés trouvés dans le texte (occurrences chevauchantes comprises) """
+        if self._automaton is not None:
+            if self.keywords:
+                # Texte ASCII : lower() donne le même résultat que la table, en plus rapide
+                text = text.lower() if text.isascii() else text.translate(self._fold)
+                for _, index in self._automaton.iter(text):
+                    yield index
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                yield from out[state]
+
+    def contains(self, text):
+        """ Vrai dès qu'un mot-clé est trouvé (arrêt au premier) """
+        for _ in self._iter_matches(text):
+            return True
+        return False
+
+_matchers = {}
+
+def get_matcher(path=KEYWORDS_PATH):
+    """ Automate compilé une seule fois par fichier de mots-clés """
+    if path not in _matchers:
+        _matchers[path] = KeywordMatcher(load_keywords(path))
+    return _matchers[path]
@@ -0,0 +1,276 @@
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import numpy as np
+from Domains import url_host
+from VerdictCache import normalize_url
+
+# Index des URLs et hôtes malveillants connus (URLhaus) : filtre de Bloom + hash exacts triés, en .npy projetables
+KNOWN_BAD_DIR = "known_bad"
+
+# Taille du filtre de Bloom : ~10 bits par clé et 7 fonctions de hachage, soit ~1 % de faux positifs avant vérification exacte
+BITS_PER_KEY = 10
+NUM_HASHES = 7
+MIN_BLOOM_BITS = 1 << 16
+
+# Type de clé : URL normalisée ou hôte seul
+KIND_URL = 0
+KIND_HOST = 1
+
+def key_hash(key):
+    """ Hash 64 bits (blake2b) d'une clé """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def url_key(url):
+    return "u:" + normalize_url(url)
+
+def host_key(host):
+    return "h:" + host
+
+def today():
+    """ Jour courant en nombre de jours depuis 1970 """
+    return (datetime.date.today() - datetime.date(1970, 1, 1)).days
+
+def bloom_bits_for(count):
+    """ Nombre de bits du filtre pour `count` clés (multiple de 8) """
+    return max(MIN_BLOOM_BITS, -(-count * BITS_PER_KEY // 8) * 8)
+
+def bloom_positions(hashes, num_bits, num_hashes=NUM_HASHES):
+    """ Positions des bits (double hachage sur les deux moitiés du hash 64 bits), tableau (n, k) """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    h1 = hashes & np.uint64(0xFFFFFFFF)
+    h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+    steps = np.arange(num_hashes, dtype=np.uint64)
+    return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(num_bits)
+
+def build_bloom(hashes, num_bits, bloom=None):
+    """ Filtre de Bloom (bits empaquetés) ; ajoute les clés à `bloom` s'il est fourni """
+    bits = np.zeros(num_bits, dtype=bool) if bloom is None else np.unpackbits(bloom, bitorder="little").astype(bool)
+    bits[bloom_positions(hashes, num_bits).ravel()] = True
+    return np.packbits(bits, bitorder="little")
+
+def expected_false_positive_rate(count, num_bits, num_hashes=NUM_HASHES):
+    return (1 - math.exp(-num_hashes * count / num_bits)) ** num_hashes if count else 0.0
+
+def load_arrays(index_dir=KNOWN_BAD_DIR, mmap_mode="r"):
+    """ Manifeste et colonnes de l'index, ou None s'il n'existe pas """
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    arrays = {
+        name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in ["hash", "kind", "source", "last_seen", "bloom"]
+    }
+    return manifest, arrays
+
+def _write_index(index_dir, manifest, arrays):
+    """ Écrire le nouvel index à côté de l'ancien puis l'échanger """
+    tmp_dir = index_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    old_dir = index_dir + ".old"
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def update_index(url_chunks, source, index_dir=KNOWN_BAD_DIR, max_age_days=None):
+    """ Ajouter les URLs (et leurs hôtes) d'une source à l'index existant, sans le reconstruire :
+        les anciennes entrées sont fusionnées telles quelles, seules les URLs reçues sont hachées.
+        Les entrées non revues depuis max_age_days jours sont retirées. """
+    start = time.perf_counter()
+    loaded = load_arrays(index_dir, mmap_mode=None)
+    if loaded is not None:
+        manifest, old = loaded
+    else:
+        manifest = {"sources": [], "num_hashes": NUM_HASHES}
+        old = {
+            "hash": np.empty(0, dtype=np.uint64), "kind": np.empty(0, dtype=np.uint8),
+            "source": np.empty(0, dtype=np.uint8), "last_seen": np.empty(0, dtype=np.uint32),
+            "bloom": None,
+        }
+    if source not in manifest["sources"]:
+        manifest["sources"].append(source)
+    source_id = manifest["sources"].index(source)
+
+    hashes, kinds = [], []
+    received = 0
+    for urls in url_chunks:
+        urls = list(urls)
+        received += len(urls)
+        hashes.append(np.fromiter((key_hash(url_key(url)) for url in urls), dtype=np.uint64, count=len(urls)))
+        kinds.append(np.full(len(urls), KIND_URL, dtype=np.uint8))
+        hosts = {url_host(url) for url in urls}
+        hosts.discard("")
+        hashes.append(np.fromiter((key_hash(host_key(host)) for host in hosts), dtype=np.uint64, count=len(hosts)))
+        kinds.append(np.full(len(hosts), KIND_HOST, dtype=np.uint8))
+    new_hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+    new_kinds = np.concatenate(kinds) if kinds else np.empty(0, dtype=np.uint8)
+
+    # Fusion : une ligne par clé, la plus récente l'emporte (source et date de dernière observation)
+    day = today()
+    all_hashes = np.concatenate([old["hash"], new_hashes])
+    all_kinds = np.concatenate([old["kind"], new_kinds])
+    all_sources = np.concatenate([old["source"], np.full(len(new_hashes), source_id, dtype=np.uint8)])
+    all_seen = np.concatenate([old["last_seen"], np.full(len(new_hashes), day, dtype=np.uint32)])
+    unique_hashes, last = np.unique(all_hashes[::-1], return_index=True)
+    keep = len(all_hashes) - 1 - last
+    added = int(len(unique_hashes) - len(old["hash"]))
+    refreshed = int(np.isin(np.unique(new_hashes), old["hash"]).sum())
+
+    arrays = {
+        "hash": unique_hashes,
+        "kind": all_kinds[keep],
+        "source": all_sources[keep],
+        "last_seen": all_seen[keep],
+    }
+    expired = 0
+    if max_age_days is not None:
+        fresh = arrays["last_seen"] >= day - max_age_days
+        expired = int((~fresh).sum())
+        arrays = {name: values[fresh] for name, values in arrays.items()}
+
+    # Filtre de Bloom : complété avec les nouvelles clés s'il a encore la capacité, recalculé depuis les hash sinon
+    count = len(arrays["hash"])
+    num_bits = manifest.get("bloom_bits", 0)
+    if old["bloom"] is not None and not expired and count <= manifest.get("capacity", 0):
+        new_keys = new_hashes[~np.isin(new_hashes, old["hash"])]
+        arrays["bloom"] = build_bloom(new_keys, num_bits, old["bloom"])
+    else:
+        capacity = max(count * 2, MIN_BLOOM_BITS // BITS_PER_KEY)
+        num_bits = bloom_bits_for(capacity)
+        manifest["capacity"] = capacity
+        arrays["bloom"] = build_bloom(arrays["hash"], num_bits)
+
+    manifest.update(
+        count=count,
+        urls=int((arrays["kind"] == KIND_URL).sum()),
+        hosts=int((arrays["kind"] == KIND_HOST).sum()),
+        bloom_bits=num_bits,
+        updated_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+    _write_index(index_dir, manifest, arrays)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Index des URLs malveillantes {index_dir} à jour en {elapsed:.2f} s : {count} clés "
+        f"({manifest['urls']} URLs, {manifest['hosts']} hôtes), {received} URLs reçues de {source}, "
+        f"{added} clés ajoutées, {refreshed} revues, {expired} expirées"
+    )
+    return {
+        "count": count, "received": received, "added": added, "refreshed": refreshed,
+        "expired": expired, "seconds": elapsed,
+    }
+
+class KnownBadIndex:
+    """ Recherche d'une URL ou d'un hôte malveillant connu : filtre de Bloom, puis recherche dichotomique exacte """
+
+    def __init__(self, index_dir=KNOWN_BAD_DIR):
+        self.manifest, arrays = load_arrays(index_dir)
+        self.arrays = arrays
+        self.sources = self.manifest["sources"]
+        self.num_bits = self.manifest["bloom_bits"]
+        self.num_hashes = self.manifest["num_hashes"]
+        # Vues mémoire : accès à un élément sans créer de scalaire NumPy
+        self._hashes = memoryview(arrays["hash"]) if len(arrays["hash"]) else []
+        self._bloom = memoryview(arrays["bloom"])
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _might_contain(self, h):
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % self.num_bits
+            if not self._bloom[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    def _match(self, key, kind):
+        h = key_hash(key)
+        if not self._might_contain(h):
+            return None
+        i = bisect.bisect_left(self._hashes, h)
+        if i == len(self._hashes) or self._hashes[i] != h:
+            return None
+        return {
+            "source": self.sources[int(self.arrays["source"][i])],
+            "match": kind,
+            "last_seen": str(datetime.date(1970, 1, 1) + datetime.timedelta(days=int(self.arrays["last_seen"][i]))),
+        }
+
+    def match_url(self, url):
+        """ URL connue (après normalisation du schéma et de l'hôte), ou None """
+        return self._match(url_key(url), "url")
+
+    def match_host(self, host):
+        """ Hôte connu pour avoir servi des URLs malveillantes, ou None """
+        return self._match(host_key(host), "host")
+
+    def measured_false_positive_rate(self, probes=100_000, seed=0):
+        """ Part de hash aléatoires (absents de l'index) acceptés par le filtre de Bloom """
+        rng = np.random.default_rng(seed)
+        hashes = rng.integers(0, np.iinfo(np.uint64).max, size=probes, dtype=np.uint64, endpoint=True)
+        hashes = hashes[~np.isin(hashes, self.arrays["hash"])]
+        bits = np.unpackbits(np.asarray(self.arrays["bloom"]), bitorder="little")
+        accepted = bits[bloom_positions(hashes, self.num_bits, self.num_hashes).astype(np.int64)].all(axis=1)
+        return float(accepted.mean()) if len(hashes) else 0.0
+
+def open_known_bad(index_dir=KNOWN_BAD_DIR):
+    """ Ouvrir l'index s'il existe (None sinon) """
+    if not os.path.exists(os.path.join(index_dir, "manifest.json")):
+        return None
+    return KnownBadIndex(index_dir)
+
+def report(index, urls, repeat=1):
+    """ Taux de faux positifs (théorique et mesuré) et latence de recherche pour des URLs connues et inconnues """
+    stats = {
+        "keys": len(index),
+        "bits_per_key": index.num_bits / len(index) if len(index) else None,
+        "expected_false_positive_rate": expected_false_positive_rate(len(index), index.num_bits, index.num_hashes),
+        "measured_false_positive_rate": index.measured_false_positive_rate(),
+    }
+    for name, sample in [("known", urls), ("unknown", [url + "/__absent__" for url in urls])]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for url in sample:
+                index.match_url(url)
+        calls = len(sample) * repeat
+        stats[f"lookup_{name}_us"] = (time.perf_counter() - start) / calls * 1e6 if calls else None
+    return stats
+
+if __name__ == "__main__":
+    from CollecteData import PHISHING_PATH, iter_phishing_urls
+
+    parser = argparse.ArgumentParser(description="Index des URLs malveillantes connues (filtre de Bloom + hash exacts)")
+    parser.add_argument("--phishing", default=PHISHING_PATH, help="CSV URLhaus à ajouter à l'index")
+    parser.add_argument("--source", default="urlhaus")
+    parser.add_argument("--index", default=KNOWN_BAD_DIR)
+    parser.add_argument("--max-age-days", type=int, help="Retirer les entrées non revues depuis ce nombre de jours")
+    parser.add_argument("--report-only", action="store_true", help="Mesurer l'index existant sans le mettre à jour")
+    args = parser.parse_args()
+
+    if not args.report_only:
+        update_index(iter_phishing_urls(args.phishing), args.source, args.index, args.max_age_days)
+
+    index = open_known_bad(args.index)
+    sample = [url for chunk in iter_phishing_urls(args.phishing) for url in chunk][:10_000]
+    stats = report(index, sample)
+    print(
+        f"📊 {stats['keys']} clés, {stats['bits_per_key']:.1f} bits/clé, faux positifs du filtre : "
+        f"{stats['measured_false_positive_rate'] * 100:.3f}% mesurés ({stats['expected_false_positive_rate'] * 100:.3f}% attendus)"
+    )
+    print(f"⏱️ Recherche : {stats['lookup_known_us']:.2f} µs (URL connue), {stats['lookup_unknown_us']:.2f} µs (URL inconnue)")
@@ -0,0 +1,231 @@
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import pandas as pd
+
+# Index binaire des règles d'autorisation / de refus par hôte (trie des suffixes sous forme de tableau trié) :
+#   en-tête  : MAGIC (8 octets) + nombre de règles (uint64)
+#   offsets  : (n + 1) x uint64, position de chaque clé dans le bloc
+#   règles   : n x uint8, combinaison des drapeaux ci-dessous
+#   bloc     : clés triées et dédupliquées, encodées en UTF-8 et concaténées
+# La clé est l'hôte écrit à l'envers ("mail.google.com" -> "moc.elgoog.liam") : les règles des suffixes
+# d'un hôte sont des préfixes de sa clé, toutes dans la même zone du tableau trié.
+MAGIC = b"LDIX0002"
+HEADER = struct.Struct("<8sQ")
+
+LEGITIMATE_CSV_PATH = "legitimate_urls.csv"
+LEGITIMATE_INDEX_PATH = "legitimate_domains.idx"
+
+# Règles ajoutées à la main, une par ligne (appliquées après le CSV, facultatives) :
+#   example.com         autoriser le domaine et tous ses sous-domaines
+#   *.example.com       autoriser les sous-domaines seulement
+#   =www.example.com    autoriser cet hôte seulement
+#   -sites.example.com  refuser (même syntaxe ; à profondeur égale le refus l'emporte)
+LEGITIMATE_OVERRIDES_PATH = "allowlist_overrides.txt"
+
+# Une clé sur FENCE_STEP est copiée en mémoire : la dichotomie se fait d'abord sur ces clés (en C),
+# puis sur au plus FENCE_STEP clés lues dans le mmap
+FENCE_STEP = 32
+
+# Drapeaux d'une règle : l'hôte lui-même et/ou ses sous-domaines
+ALLOW_HOST = 1
+ALLOW_SUBDOMAINS = 2
+DENY_HOST = 4
+DENY_SUBDOMAINS = 8
+
+def normalize_domain(domain):
+    """ Normaliser un domaine avant l'indexation ou la recherche """
+    return str(domain).strip().lower().rstrip(".")
+
+def reversed_key(host):
+    """ Clé de l'index : hôte normalisé écrit à l'envers """
+    return normalize_domain(host)[::-1].encode("utf-8")
+
+def parse_rule(line):
+    """ Ligne d'un fichier de règles -> (hôte, drapeaux), ou None pour une ligne vide ou un commentaire """
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    deny = line.startswith("-")
+    line = line.lstrip("+-")
+    if line.startswith("*."):
+        host, scope = line[2:], ALLOW_SUBDOMAINS
+    elif line.startswith("="):
+        host, scope = line[1:], ALLOW_HOST
+    else:
+        host, scope = line, ALLOW_HOST | ALLOW_SUBDOMAINS
+    # Les drapeaux de refus sont ceux d'autorisation décalés de deux bits
+    return normalize_domain(host), scope << 2 if deny else scope
+
+def read_rules(path):
+    """ Règles d'un fichier d'exceptions """
+    with open(path, encoding="utf-8") as file:
+        return [rule for rule in map(parse_rule, file) if rule is not None and rule[0]]
+
+def build_index(csv_path=LEGITIMATE_CSV_PATH, index_path=LEGITIMATE_INDEX_PATH, column="Domain", chunksize=200_000,
+                override_paths=(LEGITIMATE_OVERRIDES_PATH,)):
+    """ Construire l'index trié à partir du CSV Majestic Million (domaines et sous-domaines autorisés)
+        et des fichiers de règles qui existent """
+    rules = {}
+    scope = ALLOW_HOST | ALLOW_SUBDOMAINS
+    for chunk in pd.read_csv(csv_path, usecols=[column], chunksize=chunksize, dtype=str):
+        for domain in chunk[column].dropna():
+            rules[normalize_domain(domain)] = scope
+    rules.pop("", None)
+
+    overrides = 0
+    for path in override_paths or ():
+        if os.path.exists(path):
+            for host, flags in read_rules(path):
+                rules[host] = rules.get(host, 0) | flags
+                overrides += 1
+
+    entries = sorted((host[::-1].encode("utf-8"), flags) for host, flags in rules.items())
+
+    offsets = [0]
+    for key, _ in entries:
+        offsets.append(offsets[-1] + len(key))
+
+    # Écriture dans un fichier temporaire puis remplacement atomique
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(entries)))
+        file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        file.write(bytes(flags for _, flags in entries))
+        file.write(b"".join(key for key, _ in entries))
+    os.replace(tmp_path, index_path)
+
+    print(f"✅ Index de {len(entries)} règles ({overrides} exceptions) enregistré sous {index_path} !")
+    return len(entries)
+
+class _Keys:
+    """ Clés triées de l'index, vues comme une séquence pour bisect """
+
+    def __init__(self, index):
+        self._mmap = index._mmap
+        self._offsets = index._offsets
+        self._blob_start = index._blob_start
+        self._count = len(index)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._mmap[self._blob_start + self._offsets[i]:self._blob_start + self._offsets[i + 1]]
+
+class LegitimateIndex:
+    """ Règles d'autorisation et de refus ouvertes en mmap : la règle du plus long suffixe de l'hôte l'emporte """
+
+    def __init__(self, index_path=LEGITIMATE_INDEX_PATH):
+        self.path = index_path
+        with open(index_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"❌ {index_path} n'est pas un index de domaines valide")
+
+        self._count = count
+        offsets_start = HEADER.size
+        offsets_end = offsets_start + (count + 1) * 8
+        # Vues sans copie sur les offsets, les règles et le bloc de clés
+        self._offsets = memoryview(self._mmap)[offsets_start:offsets_end].cast("Q")
+        self._flags = memoryview(self._mmap)[offsets_end:offsets_end + count]
+        self._blob_start = offsets_end + count
+        self._keys = _Keys(self)
+        self._fence = [self._keys[i] for i in range(0, count, FENCE_STEP)]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        """ Hôte de la i-ème règle """
+        return self._keys[i].decode("utf-8")[::-1]
+
+    def _bisect(self, key):
+        """ Position de la première clé >= key """
+        block = bisect.bisect_left(self._fence, key)
+        start = (block - 1) * FENCE_STEP if block else 0
+        end = min(block * FENCE_STEP, self._count)
+        return bisect.bisect_left(self._keys, key, start, end)
+
+    def match(self, host, domain=None):
+        """ True (autorisé), False (refusé) ou None (aucune règle) pour un hôte.
+            Un seul parcours des labels, du TLD vers l'hôte complet : la règle la plus profonde l'emporte,
+            et le parcours s'arrête dès qu'aucune clé du tableau trié ne prolonge le suffixe courant.
+            Si `domain` (domaine enregistré de l'hôte) est fourni, les autorisations placées au-dessus
+            sont ignorées : autoriser un suffixe partagé (hébergement gratuit) n'autorise pas ses clients. """
+        key = reversed_key(host)
+        if not key:
+            return None
+        full = len(key)
+        allow_from = len(normalize_domain(domain)) if domain is not None else 0
+        keys = self._keys
+        verdict = None
+        count = self._count
+        dot = key.find(b".")
+        while True:
+            end = full if dot == -1 else dot
+            prefix = key[:end]
+            i = self._bisect(prefix)
+            if i == count:
+                break
+            found = keys[i]
+            if found == prefix:
+                flags = self._flags[i]
+                scope = ALLOW_HOST if end == full else ALLOW_SUBDOMAINS
+                if flags & (scope << 2):
+                    verdict = False
+                elif flags & scope and end >= allow_from:
+                    verdict = True
+                found = keys[i + 1] if i + 1 < count else b""
+            if not found.startswith(prefix):
+                # Aucune autre clé ne commence par ce suffixe : pas de règle plus profonde
+                break
+            if dot == -1:
+                break
+            dot = key.find(b".", dot + 1)
+        return verdict
+
+    def __contains__(self, domain):
+        return self.match(domain, domain) is True
+
+def index_is_stale(csv_path=LEGITIMATE_CSV_PATH, index_path=LEGITIMATE_INDEX_PATH, override_paths=(LEGITIMATE_OVERRIDES_PATH,)):
+    """ L'index doit être (re)construit s'il manque, s'il est d'un ancien format
+        ou s'il est plus ancien que le CSV ou qu'un fichier de règles """
+    if not os.path.exists(index_path):
+        return True
+    with open(index_path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return True
+    built_at = os.path.getmtime(index_path)
+    sources = [csv_path, *(override_paths or ())]
+    return any(os.path.exists(path) and built_at < os.path.getmtime(path) for path in sources)
+
+def open_index(csv_path=LEGITIMATE_CSV_PATH, index_path=LEGITIMATE_INDEX_PATH, override_paths=(LEGITIMATE_OVERRIDES_PATH,)):
+    """ Ouvrir l'index, en le construisant d'abord si nécessaire """
+    if index_is_stale(csv_path, index_path, override_paths):
+        build_index(csv_path, index_path, override_paths=override_paths)
+    return LegitimateIndex(index_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construire l'index binaire des domaines légitimes")
+    parser.add_argument("csv", nargs="?", default=LEGITIMATE_CSV_PATH, help="Fichier CSV Majestic Million")
+    parser.add_argument("index", nargs="?", default=LEGITIMATE_INDEX_PATH, help="Fichier d'index à produire")
+    parser.add_argument("--column", default="Domain", help="Colonne contenant les domaines")
+    parser.add_argument("--overrides", nargs="*", default=[LEGITIMATE_OVERRIDES_PATH],
+                        help="Fichiers de règles d'autorisation / de refus appliqués après le CSV")
+    parser.add_argument("--check", nargs="*", metavar="HÔTE", help="Afficher la règle appliquée à ces hôtes")
+    args = parser.parse_args()
+    build_index(args.csv, args.index, column=args.column, override_paths=args.overrides)
+
+    if args.check:
+        from Domains import host_domain
+
+        index = LegitimateIndex(args.index)
+        for host in args.check:
+            verdict = index.match(host, host_domain(host))
+            label = {True: "✅ autorisé", False: "❌ refusé", None: "ℹ️ aucune règle"}[verdict]
+            print(f"{host} : {label}")
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Intervalle d'échantillonnage de la mémoire résidente (secondes)
+SAMPLE_INTERVAL = 0.01
+
+def current_rss():
+    """ Mémoire résidente actuelle du processus en octets (None si la plateforme ne la fournit pas) """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return max_rss()
+
+def max_rss():
+    """ Pic de mémoire résidente depuis le démarrage du processus, en octets """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux donne des Ko, macOS des octets
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class PeakMemory:
+    """ Pic de mémoire résidente pendant un bloc `with`, mesuré par un thread d'échantillonnage """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = current_rss()
+        self._thread = threading.Thread(target=self._sample, name="peak-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+
+    @property
+    def peak_mb(self):
+        return self.peak_rss / 2**20 if self.peak_rss is not None else None
+
+    @property
+    def delta_mb(self):
+        """ Mémoire supplémentaire utilisée au pic par rapport à l'entrée dans le bloc """
+        if self.peak_rss is None or self.start_rss is None:
+            return None
+        return (self.peak_rss - self.start_rss) / 2**20
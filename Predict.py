@@ -1,81 +1,399 @@
-import joblib
-import pandas as pd
-import tldextract
-import re
-from urllib.parse import urlparse
-from sklearn.preprocessing import StandardScaler
-
-# Charger le modèle et le scaler
-model = joblib.load("model.pkl")
-scaler = joblib.load("scaler.pkl")  
-feature_names = joblib.load("feature_names.pkl")
-
-# Charger la liste des domaines légitimes
-df_legitimate = pd.read_csv("legitimate_urls.csv")  # Remplace par ton vrai fichier
-legitimate_domains = set(df_legitimate["Domain"])  # Convertir en ensemble pour une recherche rapide
-
-def extract_features(url):
-    """ Fonction pour extraire les caractéristiques d'une URL """
-    features = {}
-    
-    # Extraire le domaine principal (ex: "google" et "com")
-    extracted = tldextract.extract(url)
-    domain = f"{extracted.domain}.{extracted.suffix}"  # Ex: google.com
-    
+import argparse
+import csv
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import Telemetry
+from Domains import cache_stats, host_domain, url_host
+from Features import extract_features, extract_features_batch
+from Forest import COMPACT_MAX_ROWS
+from Resources import load_resources
+from VerdictCache import VerdictCache, resources_generation
+
+# Colonnes écrites par le mode batch
+# source : "allowlist", "model" ou "known_bad:<flux>:<url|host>" (URL ou hôte présent dans un flux d'URLs malveillantes)
+OUTPUT_FIELDS = ["url", "domain", "allowlisted", "label", "probability", "source"]
+
+# Cache des verdicts du processus (interactif, app.py, service HTTP, chaque worker du mode batch)
+verdict_cache = VerdictCache()
+
+def scale_features(scaler, features):
+    """ Même calcul que StandardScaler.transform, sans repasser par un DataFrame """
+    return (features - scaler.mean_) / scaler.scale_
+
+def predict_proba(resources, features):
+    """ Probabilités à partir des caractéristiques brutes : forêt compacte (scaler absorbé)
+        pour une URL ou un petit lot, scaler + sklearn pour les gros lots """
+    forest = resources.get("forest")
+    if forest is not None and len(features) <= COMPACT_MAX_ROWS:
+        if forest.raw_input:
+            return forest.predict_proba(features)
+        return forest.predict_proba(scale_features(resources["scaler"], features))
+    return resources["model"].predict_proba(scale_features(resources["scaler"], features))
+
+def lookup_domain(url, resources, cache=None):
+    """ Domaine et verdict de la liste blanche pour l'hôte, mémorisés par hôte dans le cache """
+    host = url_host(url)
+    entry = cache.get_host(host) if cache is not None else None
+    if entry is not None:
+        return entry
+
+    domain = host_domain(host)
+    # Règle du plus long suffixe : domaine autorisé, hôte précis autorisé, sous-domaine abusé refusé
+    allowlisted = resources["legitimate_domains"].match(host, domain) is True
+    if cache is not None:
+        cache.put_host(host, domain, allowlisted, resources_generation(resources))
+    return domain, allowlisted
+
+def match_known_bad(url, resources, allowlisted):
+    """ URL connue comme malveillante (prioritaire sur la liste blanche), ou hôte connu hors liste blanche """
+    index = resources.get("known_bad")
+    if index is None:
+        return None
+    match = index.match_url(url)
+    if match is None and not allowlisted:
+        match = index.match_host(url_host(url))
+    return match
+
+def known_bad_verdict(url, domain, match):
+    """ Verdict immédiat, sans passer par le modèle """
+    return {
+        "url": url, "domain": domain, "allowlisted": False, "label": 1, "probability": 1.0,
+        "source": f"known_bad:{match['source']}:{match['match']}",
+    }
+
+def count_verdicts(verdicts, path="single", cache_hits=0, cache_misses=0):
+    """ Compteurs de requêtes et de verdicts (sans effet si les mesures sont désactivées) """
+    if not Telemetry.is_enabled():
+        return
+    Telemetry.count("detector_requests_total", 1, path)
+    Telemetry.count("detector_urls_total", len(verdicts), path)
+    Telemetry.count("detector_allowlist_hits_total", sum(verdict["allowlisted"] for verdict in verdicts), path)
+    Telemetry.count("detector_phishing_verdicts_total", sum(verdict["label"] == 1 for verdict in verdicts), path)
+    Telemetry.count("detector_known_bad_hits_total", sum(verdict["source"].startswith("known_bad:") for verdict in verdicts), path)
+    Telemetry.count("detector_cache_hits_total", cache_hits, path)
+    Telemetry.count("detector_cache_misses_total", cache_misses, path)
+
+def score_url(url, resources=None, cache=verdict_cache):
+    """ Analyser une URL et retourner le verdict sous forme de dictionnaire """
+    if resources is None:
+        resources = load_resources()
+
+    t = Telemetry.start()
+    if cache is not None:
+        generation = cache.bind(resources)
+        verdict = cache.get(url)
+        t = Telemetry.lap("cache_lookup", t)
+        if verdict is not None:
+            count_verdicts([verdict], cache_hits=1)
+            return verdict
+
     # Vérifier si l'URL est dans la liste des sites légitimes
-    if domain in legitimate_domains:
-        print(f"✅ {url} est reconnu comme un site légitime ! 👍")
-        return None  # On ne fait pas d'analyse car c'est un site sûr
-    
-    # Longueur de l'URL
-    features["url_length"] = len(url)  
+    domain, allowlisted = lookup_domain(url, resources, cache)
+    t = Telemetry.lap("domain_allowlist", t)
+    match = match_known_bad(url, resources, allowlisted)
+    t = Telemetry.lap("known_bad", t)
+    if match is not None:
+        verdict = known_bad_verdict(url, domain, match)
+    elif allowlisted:
+        verdict = {"url": url, "domain": domain, "allowlisted": True, "label": 0, "probability": 0.0, "source": "allowlist"}
+    else:
+        # Caractéristiques dans l'ordre exact utilisé lors de l'entraînement
+        features = extract_features(url, resources["feature_names"])
+        t = Telemetry.lap("extract_features", t)
 
-    # Vérifier si l'URL contient une adresse IP
-    features["has_ip"] = 1 if re.match(r'^\d{1,3}(\.\d{1,3}){3}', url) else 0
+        # Faire la prédiction (la normalisation est absorbée par la forêt compacte quand elle est disponible)
+        model = resources["model"]
+        proba = predict_proba(resources, features)[0]
+        label = int(model.classes_[proba.argmax()])
+        probability = float(proba[list(model.classes_).index(1)])
+        verdict = {
+            "url": url, "domain": domain, "allowlisted": False, "label": label, "probability": probability, "source": "model",
+        }
+        t = Telemetry.lap("model_predict", t)
 
-    # Nombre de points (.) dans l'URL
-    features["num_dots"] = url.count('.')
+    if cache is not None:
+        cache.put(url, verdict, generation)
+        Telemetry.lap("cache_store", t)
+    count_verdicts([verdict], cache_misses=int(cache is not None))
+    return verdict
 
-    # Nombre de tirets (-) dans l'URL
-    features["num_hyphens"] = url.count('-')
+def score_batch(urls, resources=None, cache=verdict_cache):
+    """ Analyser une liste d'URLs : un seul appel au scaler et au modèle pour les URLs absentes du cache """
+    if resources is None:
+        resources = load_resources()
 
-    # Nombre de slashes (/) dans l'URL
-    features["num_slashes"] = url.count('/')
+    t = Telemetry.start()
+    results = [None] * len(urls)
+    if cache is not None:
+        generation = cache.bind(resources)
+        results = [cache.get(url) for url in urls]
+        t = Telemetry.lap("cache_lookup", t, "batch")
+    missing = [i for i, result in enumerate(results) if result is None]
 
-    # Vérifier la présence de mots suspects
-    phishing_words = ["secure", "account", "update", "verify", "banking", "free", "login", "password", "paypal", "alert"]
-    features["contains_suspicious_word"] = 1 if any(word in url.lower() for word in phishing_words) else 0
+    lookups = [lookup_domain(urls[i], resources, cache) for i in missing]
+    t = Telemetry.lap("domain_allowlist", t, "batch")
+    matches = [match_known_bad(urls[i], resources, hit) for i, (_, hit) in zip(missing, lookups)]
+    t = Telemetry.lap("known_bad", t, "batch")
+    known_bad = np.array([match is not None for match in matches], dtype=bool)
+    allowlisted = np.array([hit for _, hit in lookups], dtype=bool)
+    labels = np.zeros(len(missing), dtype=np.int64)
+    probabilities = np.zeros(len(missing), dtype=np.float64)
 
-    return pd.DataFrame([features])
+    # Seules les URLs ni connues ni en liste blanche passent par le modèle
+    to_score = np.flatnonzero(~allowlisted & ~known_bad)
+    if len(to_score):
+        model = resources["model"]
+        features = extract_features_batch([urls[missing[j]] for j in to_score], resources["feature_names"])
+        t = Telemetry.lap("extract_features", t, "batch")
+        proba = predict_proba(resources, features)
+        labels[to_score] = model.classes_[proba.argmax(axis=1)]
+        probabilities[to_score] = proba[:, list(model.classes_).index(1)]
+        t = Telemetry.lap("model_predict", t, "batch")
 
-def predict_url(url):
-    """ Fonction qui prédit si l'URL est phishing ou non """
-    if not (url.startswith("http://") or url.startswith("https://")):
-        print("❌ Veuillez entrer une URL avec http:// ou https://")
+    for i, (domain, hit), match, label, probability in zip(missing, lookups, matches, labels, probabilities):
+        if match is not None:
+            results[i] = known_bad_verdict(urls[i], domain, match)
+        else:
+            results[i] = {
+                "url": urls[i], "domain": domain, "allowlisted": bool(hit),
+                "label": int(label), "probability": float(probability), "source": "allowlist" if hit else "model",
+            }
+        if cache is not None:
+            cache.put(urls[i], results[i], generation)
+    Telemetry.lap("cache_store", t, "batch")
+
+    hits = len(urls) - len(missing) if cache is not None else 0
+    count_verdicts(results, "batch", hits, len(missing) if cache is not None else 0)
+    return results
+
+def is_web_url(url):
+    """ L'URL doit commencer par http:// ou https:// """
+    return url.startswith("http://") or url.startswith("https://")
+
+def read_urls(stream, input_format="text", column="url", rejected=None):
+    """ Lire les URLs d'un flux texte, CSV (avec en-tête) ou JSONL, ligne par ligne.
+        Les lignes JSONL illisibles (ni objet ni chaîne) sont ignorées et comptées dans `rejected` """
+    if input_format == "csv":
+        for row in csv.DictReader(stream):
+            url = (row.get(column) or "").strip()
+            if url:
+                yield url
+    elif input_format == "jsonl":
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, dict):
+                url = item.get(column)
+            elif isinstance(item, str):
+                url = item
+            else:
+                if rejected is not None:
+                    rejected["malformed"] += 1
+                continue
+            if url:
+                yield str(url).strip()
+    else:
+        for line in stream:
+            url = line.strip()
+            if url and not url.startswith("#"):
+                yield url
+
+def guess_format(path):
+    """ Deviner le format d'après l'extension du fichier """
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith(".jsonl") or path.endswith(".json"):
+        return "jsonl"
+    return "text"
+
+def web_urls(urls, rejected):
+    """ Garder les URLs http(s), comme en mode interactif ; les autres sont comptées dans `rejected` """
+    for url in urls:
+        if is_web_url(url):
+            yield url
+        else:
+            rejected["scheme"] += 1
+
+def chunk_size_type(text):
+    """ Taille de lot pour argparse : un entier >= 1 """
+    size = int(text)
+    if size < 1:
+        raise argparse.ArgumentTypeError("la taille des lots doit être au moins 1")
+    return size
+
+def chunked(iterable, size):
+    """ Découper un itérable en listes de taille fixe """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def write_results(results, stream, output_format, writer=None):
+    """ Écrire un lot de résultats en CSV ou JSONL """
+    if output_format == "jsonl":
+        for result in results:
+            stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return writer
+
+    if writer is None:
+        writer = csv.DictWriter(stream, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+    writer.writerows(results)
+    return writer
+
+# Ressources propres à chaque processus du pool
+_worker_resources = None
+
+def _init_worker():
+    """ Charger les ressources une seule fois par processus (déjà en mémoire si le pool est créé par fork) """
+    global _worker_resources
+    _worker_resources = load_resources()
+
+def _score_chunk(chunk):
+    return score_batch(chunk, _worker_resources)
+
+def iter_scored_chunks(chunks, resources, workers=1):
+    """ Analyser les lots dans l'ordre d'entrée, en parallèle si workers > 1 """
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_batch(chunk, resources)
         return
 
-    # Extraire les caractéristiques de l’URL
-    features = extract_features(url)
-    
-    if features is None:
-        return  # L'URL est légitime, pas besoin de prédiction
+    # Fenêtre bornée de lots en cours : la mémoire ne dépend pas de la taille de l'entrée
+    max_pending = workers * 2
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_score_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def predict_file(input_path="-", output_path="-", input_format=None, output_format=None, column="url", chunk_size=10_000, workers=1):
+    """ Mode batch : lire, analyser par lots de taille fixe et écrire les résultats au fil de l'eau """
+    if chunk_size < 1:
+        raise ValueError(f"❌ Taille de lot invalide : {chunk_size} (au moins 1)")
+    input_format = input_format or ("text" if input_path == "-" else guess_format(input_path))
+    output_format = output_format or ("csv" if output_path == "-" else guess_format(output_path))
+    if output_format == "text":
+        output_format = "csv"
 
-    # Réorganiser les colonnes dans l'ordre exact utilisé lors de l'entraînement
-    features = features[feature_names]
+    source = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8", newline="")
+    target = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8", newline="")
 
-    # Normaliser les données avec le même scaler utilisé lors de l'entraînement
-    features_scaled = scaler.transform(features)
+    resources = load_resources()
+    total = 0
+    phishing = 0
+    allowlisted = 0
+    known_bad = 0
+    rejected = collections.Counter()
+    writer = None
+    start = time.perf_counter()
+    try:
+        chunks = chunked(web_urls(read_urls(source, input_format, column, rejected), rejected), chunk_size)
+        for results in iter_scored_chunks(chunks, resources, workers):
+            writer = write_results(results, target, output_format, writer)
+            total += len(results)
+            phishing += sum(result["label"] for result in results)
+            allowlisted += sum(result["allowlisted"] for result in results)
+            known_bad += sum(result["source"].startswith("known_bad:") for result in results)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
 
-    # Faire la prédiction
-    prediction = model.predict(features_scaled)[0]
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    # Le rapport part sur stderr pour ne pas se mêler aux résultats sur stdout
+    print(
+        f"✅ {total} URLs analysées en {elapsed:.2f} s ({rate:.0f} URLs/s) : "
+        f"{phishing} suspectes (dont {known_bad} connues), {allowlisted} en liste blanche",
+        file=sys.stderr,
+    )
+    if rejected:
+        print(
+            f"⚠️ Lignes ignorées : {rejected['malformed']} illisibles, "
+            f"{rejected['scheme']} sans http:// ou https://",
+            file=sys.stderr,
+        )
+    # Avec plusieurs processus, les caches sont ceux des workers : ceux du processus principal ne disent rien
+    if workers <= 1:
+        stats = cache_stats()
+        if stats["hits"] + stats["misses"]:
+            print(f"🔁 Cache des domaines : {stats['hit_rate'] * 100:.1f}% de hits ({stats['size']} hôtes)", file=sys.stderr)
+        stats = verdict_cache.stats()
+        if stats["hits"] + stats["misses"]:
+            print(
+                f"🔁 Cache des verdicts : {stats['hit_rate'] * 100:.1f}% de hits, "
+                f"{stats['evictions']} évictions ({stats['size']} URLs, {stats['host_size']} hôtes)",
+                file=sys.stderr,
+            )
+    return {
+        "total": total, "phishing": phishing, "allowlisted": allowlisted, "known_bad": known_bad,
+        "rejected": sum(rejected.values()), "seconds": elapsed, "urls_per_second": rate,
+    }
+
+def predict_url(url):
+    """ Fonction qui prédit si l'URL est phishing ou non """
+    if not is_web_url(url):
+        print("❌ Veuillez entrer une URL avec http:// ou https://")
+        return
+
+    result = score_url(url)
 
     # Afficher le résultat
-    if prediction == 1:
+    if result["source"].startswith("known_bad:"):
+        print(f"⚠️ {url} est un site MALVEILLANT connu (source : {result['source'].split(':')[1]}) ! 🚨")
+    elif result["allowlisted"]:
+        print(f"✅ {url} est reconnu comme un site légitime ! 👍")
+    elif result["label"] == 1:
         print(f"⚠️ {url} est POTENTIELLEMENT un site de PHISHING ! 🚨")
     else:
         print(f"✅ {url} est probablement SÛRE ! 👍")
 
+    return result
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Détecteur de phishing : une URL en interactif, ou un fichier complet en mode batch")
+    parser.add_argument("--batch", metavar="FICHIER", help="Fichier d'URLs à analyser ('-' pour stdin)")
+    parser.add_argument("--output", default="-", help="Fichier de résultats ('-' pour stdout)")
+    parser.add_argument("--input-format", choices=["text", "csv", "jsonl"], help="Format d'entrée (deviné d'après l'extension par défaut)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], help="Format de sortie (deviné d'après l'extension par défaut)")
+    parser.add_argument("--column", default="url", help="Colonne / clé contenant l'URL (CSV et JSONL)")
+    parser.add_argument("--chunk-size", type=chunk_size_type, default=10_000, help="Nombre d'URLs analysées par lot")
+    parser.add_argument("--workers", type=int, default=1, help="Nombre de processus d'analyse (0 = tous les cœurs)")
+    parser.add_argument("--metrics-file", help="Écrire les mesures par étape (format Prometheus) dans ce fichier à la fin")
+    return parser.parse_args(argv)
+
 # Interface utilisateur
 if __name__ == "__main__":
-    url_input = input("🔗 Entrez une URL à analyser (avec http:// ou https://) : ")
-    predict_url(url_input)
+    args = parse_args()
+    Telemetry.configure_from_env()
+    if args.metrics_file:
+        Telemetry.enable()
+    if args.batch:
+        workers = args.workers or os.cpu_count()
+        if args.metrics_file and workers > 1:
+            print("⚠️ Mesures du processus principal seulement : utilisez --workers 1 pour mesurer chaque étape", file=sys.stderr)
+        predict_file(args.batch, args.output, args.input_format, args.output_format, args.column, args.chunk_size, workers)
+    else:
+        url_input = input("🔗 Entrez une URL à analyser (avec http:// ou https://) : ")
+        predict_url(url_input)
+    if args.metrics_file:
+        Telemetry.write_metrics_file(args.metrics_file)
+        print(f"✅ Mesures enregistrées dans {args.metrics_file}", file=sys.stderr)
@@ -0,0 +1,209 @@
+import os
+import sys
+import threading
+import time
+import joblib
+import numpy as np
+from Bundle import BUNDLE_DIR, load_bundle, verify_files
+from Domains import host_domain, url_host
+from Features import extract_features
+from Forest import FOREST_PATH, file_digest, load_forest
+from KnownBad import KNOWN_BAD_DIR, open_known_bad
+from LegitimateIndex import LEGITIMATE_INDEX_PATH, LEGITIMATE_OVERRIDES_PATH, open_index
+
+# Paquet versionné (prioritaire), sinon les fichiers séparés d'origine
+BUNDLE_MANIFEST_PATH = os.path.join(BUNDLE_DIR, "manifest.json")
+
+# Index des URLs malveillantes connues (facultatif), remplacé en entier à chaque mise à jour du flux
+KNOWN_BAD_MANIFEST_PATH = os.path.join(KNOWN_BAD_DIR, "manifest.json")
+
+# Fichiers nécessaires à la prédiction
+MODEL_PATH = "model.pkl"
+SCALER_PATH = "scaler.pkl"
+FEATURE_NAMES_PATH = "feature_names.pkl"
+LEGITIMATE_PATH = "legitimate_urls.csv"
+
+# URL de la prédiction d'essai faite avant d'activer une nouvelle version
+WARMUP_URL = "http://example.com/login"
+
+# Intervalle de surveillance des fichiers (secondes) et nombre d'essais si les fichiers changent pendant le chargement
+WATCH_INTERVAL = 5.0
+LOAD_ATTEMPTS = 3
+
+RESOURCE_PATHS = [
+    BUNDLE_MANIFEST_PATH, MODEL_PATH, SCALER_PATH, FEATURE_NAMES_PATH, LEGITIMATE_PATH, LEGITIMATE_OVERRIDES_PATH,
+    LEGITIMATE_INDEX_PATH, FOREST_PATH, KNOWN_BAD_MANIFEST_PATH,
+]
+
+# Cache partagé par tout le processus (toutes les sessions Streamlit)
+_lock = threading.Lock()
+_cache = {"signature": None, "resources": None}
+
+# Rechargement à chaud : un seul à la fois, une version refusée n'est pas retentée tant que les fichiers ne changent pas
+_state = {"reloading": False, "failed_signature": None, "watcher": None}
+
+# Métriques de chargement et version active
+metrics = {
+    "loads": 0,
+    "last_load_seconds": 0.0,
+    "total_load_seconds": 0.0,
+    "version": None,
+    "activated_at": None,
+    "reloads": 0,
+    "reload_failures": 0,
+    "last_error": None,
+}
+
+def files_signature(paths):
+    """ Signature (mtime, taille) des fichiers pour détecter une modification sur disque """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def _load_legacy_model():
+    """ Ancien format : trois pickles séparés et la forêt compacte exportée à côté """
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    feature_names = joblib.load(FEATURE_NAMES_PATH)
+
+    # Forêt compacte pour les petits lots, seulement si elle a été exportée depuis ce model.pkl
+    forest = None
+    if os.path.exists(FOREST_PATH):
+        forest = load_forest(FOREST_PATH)
+        if forest.model_digest != file_digest(MODEL_PATH):
+            forest = None
+        elif forest.raw_input and forest.scaler_digest != file_digest(SCALER_PATH):
+            forest = None
+
+    return {
+        "version": "legacy-" + file_digest(MODEL_PATH)[:8],
+        "model": model,
+        "forest": forest,
+        "scaler": scaler,
+        "feature_names": feature_names,
+    }
+
+def _load_all():
+    """ Charger réellement les fichiers depuis le disque """
+    if os.path.exists(BUNDLE_MANIFEST_PATH):
+        resources = load_bundle(BUNDLE_DIR)
+    else:
+        resources = _load_legacy_model()
+
+    # Index mmap partagé entre processus via le cache de pages (reconstruit si le CSV est plus récent)
+    resources["legitimate_domains"] = open_index(LEGITIMATE_PATH, LEGITIMATE_INDEX_PATH)
+    resources["known_bad"] = open_known_bad(KNOWN_BAD_DIR)
+    return resources
+
+def _warm_up(resources):
+    """ Prédiction d'essai sur les nouvelles ressources : elles ne sont activées que si elle réussit """
+    if "manifest" in resources:
+        corrupted = verify_files(BUNDLE_DIR, resources["manifest"])
+        if corrupted:
+            raise ValueError(f"❌ Fichiers du paquet modifiés ou absents : {', '.join(corrupted)}")
+
+    # Parcours complet : index des domaines, extraction, forêt (ou scaler + modèle)
+    host = url_host(WARMUP_URL)
+    resources["legitimate_domains"].match(host, host_domain(host))
+    if resources["known_bad"] is not None:
+        resources["known_bad"].match_url(WARMUP_URL)
+    features = extract_features(WARMUP_URL, resources["feature_names"])
+    forest = resources["forest"]
+    if forest is not None and forest.raw_input:
+        proba = forest.predict_proba(features)
+    else:
+        scaler = resources["scaler"]
+        predictor = forest if forest is not None else resources["model"]
+        proba = predictor.predict_proba((features - scaler.mean_) / scaler.scale_)
+    if proba.shape != (1, len(resources["model"].classes_)) or not np.isclose(proba.sum(), 1.0):
+        raise ValueError(f"❌ Prédiction d'essai invalide : {proba}")
+
+def _load_stable():
+    """ Charger et tester les ressources, recommencer si les fichiers ont changé pendant le chargement """
+    signature = files_signature(RESOURCE_PATHS)
+    for _ in range(LOAD_ATTEMPTS):
+        start = time.perf_counter()
+        resources = _load_all()
+        _warm_up(resources)
+        elapsed = time.perf_counter() - start
+
+        # Signature relevée après chargement : l'index a pu être (re)construit entre-temps
+        loaded_signature, signature = signature, files_signature(RESOURCE_PATHS)
+        if loaded_signature == signature:
+            break
+    return resources, signature, elapsed
+
+def _activate(resources, signature, elapsed):
+    """ Remplacer la référence partagée : les prédictions en cours finissent sur l'ancienne version """
+    resources["load_seconds"] = elapsed
+    metrics["loads"] += 1
+    # Numéro de chargement : les caches dérivés (verdicts) sont vidés quand il change
+    resources["generation"] = metrics["loads"]
+    metrics["last_load_seconds"] = elapsed
+    metrics["total_load_seconds"] += elapsed
+    metrics["version"] = resources["version"]
+    metrics["activated_at"] = time.time()
+
+    _cache["signature"] = signature
+    _cache["resources"] = resources
+    print(f"✅ Ressources chargées en {elapsed:.2f} s (modèle {resources['version']})", file=sys.stderr)
+
+def _reload():
+    try:
+        resources, signature, elapsed = _load_stable()
+    except Exception as error:
+        # Nouvelle version refusée : l'ancienne reste active, nouvel essai au prochain changement de fichier
+        _state["failed_signature"] = files_signature(RESOURCE_PATHS)
+        metrics["reload_failures"] += 1
+        metrics["last_error"] = f"{type(error).__name__}: {error}"
+        print(f"⚠️ Rechargement refusé, modèle {metrics['version']} conservé : {metrics['last_error']}", file=sys.stderr)
+    else:
+        with _lock:
+            _activate(resources, signature, elapsed)
+            metrics["reloads"] += 1
+    finally:
+        _state["reloading"] = False
+
+def check_for_update():
+    """ Lancer un rechargement en arrière-plan si un fichier a changé sur disque (sans attendre) """
+    signature = files_signature(RESOURCE_PATHS)
+    if _cache["resources"] is None or signature == _cache["signature"]:
+        return False
+    with _lock:
+        if _state["reloading"] or signature == _state["failed_signature"]:
+            return False
+        _state["reloading"] = True
+    threading.Thread(target=_reload, name="resources-reload", daemon=True).start()
+    return True
+
+def start_watcher(interval=WATCH_INTERVAL):
+    """ Surveiller les fichiers périodiquement : une nouvelle version est prise sans attendre de requête """
+    with _lock:
+        if _state["watcher"] is None:
+            def watch():
+                while True:
+                    time.sleep(interval)
+                    check_for_update()
+
+            _state["watcher"] = threading.Thread(target=watch, name="resources-watcher", daemon=True)
+            _state["watcher"].start()
+    return _state["watcher"]
+
+def load_resources():
+    """ Retourner les ressources actives ; le premier appel charge, les suivants ne bloquent jamais :
+        une modification sur disque est chargée en arrière-plan puis échangée """
+    resources = _cache["resources"]
+    if resources is None:
+        with _lock:
+            # Un autre thread a peut-être déjà fait le chargement
+            if _cache["resources"] is None:
+                _activate(*_load_stable())
+            return _cache["resources"]
+
+    check_for_update()
+    return resources
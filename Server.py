@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import time
+import numpy as np
+import tornado.web
+import Telemetry
+from Predict import score_batch, verdict_cache
+from Resources import load_resources, metrics as resources_metrics, start_watcher
+
+# Paramètres du regroupement des requêtes
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 2.0
+
+# Nombre maximal d'URLs acceptées dans une requête /v1/score:batch
+MAX_REQUEST_URLS = 10_000
+
+# Nombre de latences gardées pour le calcul des percentiles
+LATENCY_WINDOW = 10_000
+
+class ServiceStats:
+    """ Latences (fenêtre glissante) et débit du service """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.urls = 0
+        self.batches = 0
+
+    def record(self, seconds, urls=1):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.urls += urls
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "urls": self.urls,
+            "model_batches": self.batches,
+            "uptime_seconds": uptime,
+            "urls_per_second": self.urls / uptime if uptime > 0 else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p99": float(np.percentile(latencies, 99)),
+            },
+        }
+
+class MicroBatcher:
+    """ Regroupe les requêtes concurrentes pendant quelques millisecondes avant d'appeler le modèle """
+
+    def __init__(self, stats, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # Un seul thread pour le modèle : la boucle asyncio reste libre pour accepter les requêtes
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def score(self, url):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((url, future))
+        return await future
+
+    async def score_many(self, urls):
+        """ Une requête batch est déjà un lot : elle part telle quelle au modèle """
+        return await self._run_model(urls)
+
+    async def _run_model(self, urls):
+        loop = asyncio.get_running_loop()
+        self.stats.batches += 1
+        return await loop.run_in_executor(self.executor, score_batch, urls, load_resources())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await self._run_model([url for url, _ in items])
+            except Exception as error:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+def check_url(url):
+    """ Même règle que predict_url : l'URL doit commencer par http:// ou https:// """
+    if not isinstance(url, str) or not (url.startswith("http://") or url.startswith("https://")):
+        raise tornado.web.HTTPError(400, reason="Veuillez entrer une URL avec http:// ou https://")
+    return url
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher, stats, max_request_urls=MAX_REQUEST_URLS):
+        self.batcher = batcher
+        self.stats = stats
+        self.max_request_urls = max_request_urls
+
+    def read_json(self):
+        """ Corps de la requête : un objet JSON, sinon 400 """
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="JSON invalide")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="Le corps doit être un objet JSON")
+        return body
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+class ScoreHandler(BaseHandler):
+    async def post(self):
+        start = time.perf_counter()
+        url = check_url(self.read_json().get("url"))
+        result = await self.batcher.score(url)
+        self.stats.record(time.perf_counter() - start)
+        self.write(result)
+
+class ScoreBatchHandler(BaseHandler):
+    async def post(self):
+        start = time.perf_counter()
+        urls = self.read_json().get("urls")
+        if not isinstance(urls, list):
+            raise tornado.web.HTTPError(400, reason="Le champ urls doit être une liste")
+        if len(urls) > self.max_request_urls:
+            raise tornado.web.HTTPError(413, reason=f"Au plus {self.max_request_urls} URLs par requête")
+        urls = [check_url(url) for url in urls]
+        results = await self.batcher.score_many(urls) if urls else []
+        self.stats.record(time.perf_counter() - start, len(urls))
+        self.write({"results": results})
+
+class StatsHandler(BaseHandler):
+    def get(self):
+        snapshot = self.stats.snapshot()
+        # Version active, pour relier une alerte à un déploiement
+        snapshot["model"] = {
+            key: resources_metrics[key]
+            for key in ["version", "activated_at", "reloads", "reload_failures", "last_error"]
+        }
+        snapshot["verdict_cache"] = verdict_cache.stats()
+        known_bad = load_resources()["known_bad"]
+        snapshot["known_bad"] = None if known_bad is None else {
+            key: known_bad.manifest[key] for key in ["sources", "count", "updated_at"]
+        }
+        self.write(snapshot)
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        """ Mesures par étape au format Prometheus, plus la version active du modèle """
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(Telemetry.render_prometheus())
+        self.write(
+            "# HELP detector_model_info Version du modèle actif\n"
+            "# TYPE detector_model_info gauge\n"
+            f'detector_model_info{{version="{resources_metrics["version"]}"}} 1\n'
+        )
+
+def make_app(max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_request_urls=MAX_REQUEST_URLS):
+    """ Application Tornado ; le batcher démarre avec la boucle asyncio """
+    stats = ServiceStats()
+    batcher = MicroBatcher(stats, max_batch_size, max_wait_ms)
+    args = {"batcher": batcher, "stats": stats, "max_request_urls": max_request_urls}
+    app = tornado.web.Application([
+        (r"/v1/score", ScoreHandler, args),
+        (r"/v1/score:batch", ScoreBatchHandler, args),
+        (r"/v1/stats", StatsHandler, args),
+        (r"/metrics", MetricsHandler, args),
+    ])
+    app.batcher = batcher
+    return app
+
+async def serve(host, port, max_batch_size, max_wait_ms, metrics=True, max_request_urls=MAX_REQUEST_URLS):
+    Telemetry.enable(metrics)
+    load_resources()  # Chargement avant la première requête
+    start_watcher()  # Nouvelle version chargée en arrière-plan, échangée après une prédiction d'essai
+    app = make_app(max_batch_size, max_wait_ms, max_request_urls)
+    app.batcher.start()
+    app.listen(port, address=host)
+    print(f"✅ Service de détection à l'écoute sur http://{host}:{port}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP de détection de phishing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Taille maximale d'un lot envoyé au modèle")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Attente maximale pour compléter un lot")
+    parser.add_argument("--max-request-urls", type=int, default=MAX_REQUEST_URLS, help="Nombre maximal d'URLs par requête batch")
+    parser.add_argument("--no-metrics", action="store_true", help="Désactiver les mesures par étape (/metrics reste vide)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms, not args.no_metrics, args.max_request_urls))
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Types compacts des colonnes : compteurs sur int16, indicateurs booléens, label sur uint8
+FEATURE_DTYPES = {
+    "url_length": np.int16,
+    "num_dots": np.int16,
+    "num_hyphens": np.int16,
+    "num_slashes": np.int16,
+    "has_ip": np.bool_,
+    "contains_suspicious_word": np.bool_,
+    # Caractéristiques supplémentaires (--all-features)
+    "num_digits": np.int16,
+    "num_special": np.int16,
+    "num_at": np.int16,
+    "num_percent": np.int16,
+    "num_equals": np.int16,
+    "num_ampersand": np.int16,
+    "path_depth": np.int16,
+    "query_length": np.int16,
+    "entropy": np.float32,
+}
+LABEL_DTYPE = np.uint8
+
+DATASET_SCHEMA = pa.schema([("url", pa.string()), ("label", pa.uint8())])
+
+def features_schema(feature_names):
+    """ Schéma du fichier de caractéristiques pour ces colonnes, suivies du label """
+    return pa.schema(
+        [(name, pa.from_numpy_dtype(FEATURE_DTYPES[name])) for name in feature_names] + [("label", pa.uint8())]
+    )
+
+def is_csv(path):
+    return str(path).endswith(".csv")
+
+def cast_column(name, values):
+    """ Convertir une colonne vers son type compact (les compteurs saturent à la borne de int16) """
+    dtype = FEATURE_DTYPES.get(name, LABEL_DTYPE if name == "label" else None)
+    values = np.asarray(values)
+    if dtype is None:
+        return values
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        values = np.clip(values, info.min, info.max)
+    return values.astype(dtype)
+
+def cast_features(df):
+    """ Appliquer les types compacts à un DataFrame de caractéristiques """
+    return pd.DataFrame({name: cast_column(name, df[name]) for name in df.columns}, index=df.index)
+
+def read_table(path, columns=None):
+    """ Lire une table Parquet (ou CSV, pour l'import) """
+    if is_csv(path):
+        return pd.read_csv(path, usecols=columns)
+    return pd.read_parquet(path, columns=columns)
+
+def iter_table(path, chunksize, columns=None):
+    """ Lire une table par lots, sans la charger entièrement """
+    if is_csv(path):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+def count_rows(path):
+    """ Nombre de lignes d'une table Parquet (lu dans les métadonnées), None pour un CSV """
+    if is_csv(path):
+        return None
+    return pq.ParquetFile(path).metadata.num_rows
+
+class TableWriter:
+    """ Écriture d'une table lot par lot, en Parquet (un row group par lot) ou en CSV """
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.schema = schema
+        self._writer = None
+        self._file = None
+
+    def write(self, df):
+        if is_csv(self.path):
+            if self._file is None:
+                self._file = open(self.path, "w", encoding="utf-8", newline="")
+                df.to_csv(self._file, index=False)
+            else:
+                df.to_csv(self._file, index=False, header=False)
+            return
+
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif self._file is None and not is_csv(self.path) and self.schema is not None:
+            # Aucun lot : table vide mais valide
+            pq.write_table(self.schema.empty_table(), self.path)
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,139 @@
+import bisect
+import os
+import threading
+import time
+
+# Mesures désactivées par défaut : chaque point de mesure se réduit alors à un test sur None.
+# DETECTION_METRICS=1 les active ; DETECTION_METRICS_FILE=chemin les active et écrit le fichier périodiquement.
+METRICS_ENV = "DETECTION_METRICS"
+METRICS_FILE_ENV = "DETECTION_METRICS_FILE"
+EXPORT_INTERVAL = 10.0
+
+# Bornes des histogrammes de latence (secondes)
+BUCKETS = [
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+]
+
+HELP = {
+    "detector_stage_seconds": "Durée de chaque étape de la prédiction",
+    "detector_requests_total": "Appels de prédiction (une URL ou un lot)",
+    "detector_urls_total": "URLs analysées",
+    "detector_allowlist_hits_total": "URLs en liste blanche",
+    "detector_phishing_verdicts_total": "URLs jugées suspectes",
+    "detector_known_bad_hits_total": "URLs ou hôtes présents dans un flux d'URLs malveillantes",
+    "detector_cache_hits_total": "Verdicts servis par le cache",
+    "detector_cache_misses_total": "Verdicts absents du cache",
+}
+
+_lock = threading.Lock()
+_state = {"enabled": False, "exporter": None}
+_histograms = {}
+_counters = {}
+
+class Histogram:
+    """ Histogramme cumulatif au format Prometheus """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+def enable(enabled=True):
+    _state["enabled"] = enabled
+
+def is_enabled():
+    return _state["enabled"]
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+def start():
+    """ Début d'une mesure : None si les mesures sont désactivées """
+    return time.perf_counter() if _state["enabled"] else None
+
+def lap(stage, since, path="single"):
+    """ Enregistrer la durée écoulée depuis `since` pour l'étape et repartir de maintenant """
+    if since is None:
+        return None
+    now = time.perf_counter()
+    key = (stage, path)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(now - since)
+    return now
+
+def count(name, value=1, path="single"):
+    """ Incrémenter un compteur (sans effet si les mesures sont désactivées) """
+    if not _state["enabled"] or not value:
+        return
+    key = (name, path)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus():
+    """ Toutes les mesures au format texte d'exposition Prometheus """
+    with _lock:
+        histograms = {key: (list(h.buckets), h.sum, h.count) for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    if histograms:
+        name = "detector_stage_seconds"
+        lines += [f"# HELP {name} {HELP[name]}", f"# TYPE {name} histogram"]
+        for (stage, path), (buckets, total, observations) in sorted(histograms.items()):
+            labels = f'path="{path}",stage="{stage}"'
+            cumulative = 0
+            for bound, observed in zip(BUCKETS + ["+Inf"], buckets):
+                cumulative += observed
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {_format(total)}")
+            lines.append(f"{name}_count{{{labels}}} {observations}")
+
+    for name in sorted({name for name, _ in counters}):
+        lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+        for (counter, path), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'{name}{{path="{path}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(path):
+    """ Écrire les mesures dans un fichier (remplacé atomiquement, lisible par node_exporter textfile) """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+def start_file_exporter(path, interval=EXPORT_INTERVAL):
+    """ Activer les mesures et écrire le fichier périodiquement en arrière-plan """
+    enable()
+    with _lock:
+        if _state["exporter"] is None:
+            def export():
+                while True:
+                    time.sleep(interval)
+                    write_metrics_file(path)
+
+            _state["exporter"] = threading.Thread(target=export, name="metrics-exporter", daemon=True)
+            _state["exporter"].start()
+    return _state["exporter"]
+
+def configure_from_env():
+    """ Activer les mesures d'après les variables d'environnement """
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path:
+        start_file_exporter(path)
+    elif os.environ.get(METRICS_ENV) == "1":
+        enable()
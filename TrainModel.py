@@ -1,51 +1,168 @@
-import pandas as pd
+import argparse
+import sys
+import time
+from Storage import iter_table, read_table
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
+import numpy as np
+import pandas as pd
+from Bundle import BUNDLE_DIR, compact_arrays, data_digest, write_bundle
+from Forest import CompactForest, check_identical
+from Memory import PeakMemory
+
+# Taille des lots lus quand l'échantillon est tiré en flux
+CHUNK_SIZE = 500_000
+
+# Estimateurs disponibles : forêt aléatoire (tous les cœurs) et gradient boosting sur histogrammes (gros volumes)
+ESTIMATORS = {
+    "rf": lambda n_jobs: RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs),
+    "hgb": lambda n_jobs: HistGradientBoostingClassifier(random_state=42),
+}
+
+def sample_table(features_path, sample, chunksize=CHUNK_SIZE, seed=42):
+    """ Tirage uniforme de `sample` lignes en lisant le fichier par lots (mémoire bornée par sample + chunksize) """
+    rng = np.random.default_rng(seed)
+    kept, kept_keys = None, np.empty(0)
+    for chunk in iter_table(features_path, chunksize):
+        # Chaque ligne reçoit une clé aléatoire : on garde les `sample` plus petites clés vues jusqu'ici
+        keys = np.concatenate([kept_keys, rng.random(len(chunk))])
+        rows = chunk if kept is None else pd.concat([kept, chunk], ignore_index=True)
+        best = np.sort(np.argpartition(keys, sample)[:sample]) if len(keys) > sample else np.arange(len(keys))
+        kept, kept_keys = rows.iloc[best].reset_index(drop=True), keys[best]
+    return kept
+
+def load_features(features_path="dataset_features.parquet", store_dir=None, sample=None):
+    """ Charger les caractéristiques depuis le fichier Parquet (ou CSV) ou depuis le magasin incrémental,
+        réduites à un échantillon aléatoire de `sample` lignes si demandé """
+    if store_dir:
+        from FeatureStore import load_training_matrix
+        X, y = load_training_matrix(store_dir)
+        if sample and len(X) > sample:
+            rows = np.sort(np.random.default_rng(42).choice(len(X), sample, replace=False))
+            X, y = X.iloc[rows].reset_index(drop=True), y.iloc[rows].reset_index(drop=True)
+        return X, y
+
+    df = sample_table(features_path, sample) if sample else read_table(features_path)
+
+    # Séparer les features (X) et les labels (y)
+    X = df.drop(columns=["label"])  # Supprimer la colonne label pour garder les features
+    y = df["label"]  # Label (0 = légitime, 1 = phishing)
+    return X, y
+
+def fit_estimator(name, X_train, y_train, X_test, y_test, n_jobs=-1):
+    """ Entraîner un estimateur et mesurer durée d'ajustement, pic mémoire et précision """
+    # Initialiser le modèle
+    model = ESTIMATORS[name](n_jobs)
+
+    # Entraîner le modèle sur les données d'entraînement
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+    # Prédire sur l'ensemble de test
+    y_pred = model.predict(X_test)
+    result = {
+        "estimator": name,
+        "fit_seconds": fit_seconds,
+        "peak_rss_mb": memory.peak_mb,
+        "fit_memory_mb": memory.delta_mb,
+        "accuracy": accuracy_score(y_test, y_pred),
+    }
+    return model, y_pred, result
+
+def print_comparison(results):
+    """ Tableau comparatif des estimateurs """
+    print(f"📊 {'Estimateur':<10} {'Précision':>10} {'Ajustement':>12} {'Mémoire max':>12} {'Mémoire ajust.':>15}")
+    for result in results:
+        peak = f"{result['peak_rss_mb']:.0f} Mo" if result["peak_rss_mb"] is not None else "n/d"
+        delta = f"+{result['fit_memory_mb']:.0f} Mo" if result["fit_memory_mb"] is not None else "n/d"
+        print(
+            f"   {result['estimator']:<10} {result['accuracy'] * 100:>9.2f}% "
+            f"{result['fit_seconds']:>10.2f} s {peak:>12} {delta:>15}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraînement du modèle de détection de phishing")
+    parser.add_argument("--features", default="dataset_features.parquet", help="Fichier de caractéristiques (Parquet, ou CSV)")
+    parser.add_argument("--feature-store", help="Dossier du magasin de caractéristiques (remplace --features)")
+    parser.add_argument("--bundle", default=BUNDLE_DIR, help="Dossier du paquet de modèle produit")
+    parser.add_argument("--estimator", choices=[*ESTIMATORS, "all"], default="rf",
+                        help="Estimateur entraîné ('all' : les comparer et garder le plus précis)")
+    parser.add_argument("--sample", type=int, help="Nombre maximal de lignes utilisées, tirées en lisant le fichier par lots")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cœurs utilisés par la forêt aléatoire (-1 : tous)")
+    args = parser.parse_args(argv)
 
-# Charger les caractéristiques extraites
-df = pd.read_csv("dataset_features.csv")
+    # Charger les caractéristiques extraites
+    X, y = load_features(args.features, args.feature_store, args.sample)
 
-# Séparer les features (X) et les labels (y)
-X = df.drop(columns=["label"])  # Supprimer la colonne label pour garder les features
-y = df["label"]  # Label (0 = légitime, 1 = phishing)
+    # Diviser en ensemble d'entraînement (80%) et de test (20%)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Diviser en ensemble d'entraînement (80%) et de test (20%)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Caractéristiques brutes gardées pour vérifier la forêt avec scaler absorbé
+    X_test_raw = X_test.to_numpy(dtype=np.float64)
 
-# Normalisation des données
-scaler = StandardScaler()
-X_train = scaler.fit_transform(X_train)
-X_test = scaler.transform(X_test)
+    # Normalisation des données
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
 
-print("✅ Données préparées avec succès !")
+    print(f"✅ Données préparées avec succès ! ({len(X_train)} lignes d'entraînement, {len(X_test)} de test)")
 
-# Initialiser le modèle
-model = RandomForestClassifier(n_estimators=100, random_state=42)
+    # Entraîner chaque estimateur demandé, comparer et garder le plus précis
+    names = list(ESTIMATORS) if args.estimator == "all" else [args.estimator]
+    fitted = {}
+    for name in names:
+        print(f"⏳ Entraînement : {name}")
+        fitted[name] = fit_estimator(name, X_train, y_train, X_test, y_test, args.n_jobs)
+    results = [result for _, _, result in fitted.values()]
+    print_comparison(results)
 
-# Entraîner le modèle sur les données d'entraînement
-model.fit(X_train, y_train)
+    best = max(results, key=lambda result: result["accuracy"])
+    model, y_pred, _ = fitted[best["estimator"]]
 
-# Prédire sur l'ensemble de test
-y_pred = model.predict(X_test)
+    # Le modèle sauvegardé prédit sur un seul cœur : le parallélisme en service vient des workers de Predict/Server
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = None
 
-# Afficher la précision
-accuracy = accuracy_score(y_test, y_pred)
-print(f"✅ Précision du modèle : {accuracy * 100:.2f}%")
+    # Afficher la précision
+    accuracy = best["accuracy"]
+    print(f"✅ Précision du modèle ({best['estimator']}) : {accuracy * 100:.2f}%")
 
-# Afficher un rapport détaillé
-print("🔍 Rapport de classification :\n", classification_report(y_test, y_pred))
+    # Afficher un rapport détaillé
+    print("🔍 Rapport de classification :\n", classification_report(y_test, y_pred))
 
-# Sauvegarder le modèle et le scaler
-joblib.dump(model, "model.pkl")
-print("✅ Modèle sauvegardé sous model.pkl")
+    # Un seul paquet versionné : ordre des features, mots-clés, empreinte des données, métriques,
+    # forêt compacte (scaler absorbé), scaler et modèle sklearn
+    metrics = {
+        "accuracy": accuracy,
+        "estimator": best["estimator"],
+        "fit_seconds": best["fit_seconds"],
+        "peak_rss_mb": best["peak_rss_mb"],
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "report": classification_report(y_test, y_pred, output_dict=True),
+        "comparison": results,
+    }
+    training_data = {
+        "source": args.feature_store or args.features,
+        "rows": len(X),
+        "sample": args.sample,
+        "digest": data_digest(X, y),
+    }
+    # Vérifier que la forêt compacte reproduit exactement scaler + sklearn avant de publier le paquet
+    arrays = compact_arrays(model, scaler, list(X.columns))
+    if arrays is None:
+        print("ℹ️ Pas de forêt compacte pour cet estimateur : la prédiction passe par le modèle sklearn")
+    elif check_identical(model, CompactForest(arrays), X_test, X_test_raw):
+        print("✅ Forêt compacte identique au modèle sklearn")
+    else:
+        print(f"❌ La forêt compacte diverge du modèle sklearn : paquet {args.bundle} non publié")
+        sys.exit(1)
 
-joblib.dump(scaler, "scaler.pkl")
-print("✅ Scaler sauvegardé sous scaler.pkl")
+    write_bundle(model, scaler, list(X.columns), metrics, training_data, args.bundle)
 
-# Sauvegarder l'ordre des features
-feature_names = list(X.columns)
-joblib.dump(feature_names, "feature_names.pkl")
-print("✅ Liste des features sauvegardée sous feature_names.pkl")
+if __name__ == "__main__":
+    main()
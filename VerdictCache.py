@@ -0,0 +1,131 @@
+import collections
+import threading
+import time
+
+# Limites par défaut : nombre d'entrées et durée de vie (secondes)
+MAX_URLS = 100_000
+MAX_HOSTS = 100_000
+TTL_SECONDS = 3600.0
+
+def normalize_url(url):
+    """ Clé du cache : schéma et hôte en minuscules (insensibles à la casse), reste de l'URL inchangé """
+    scheme, separator, rest = url.partition("://")
+    if not separator:
+        scheme, rest = "", url
+    end = len(rest)
+    for char in "/?#":
+        position = rest.find(char)
+        if position != -1:
+            end = min(end, position)
+    return f"{scheme.lower()}{separator}{rest[:end].lower()}{rest[end:]}"
+
+class LRUCache:
+    """ Dictionnaire borné : les entrées expirent après ttl secondes, la moins récemment utilisée est évincée """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < now:
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, now):
+        self.entries[key] = (value, now + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+def resources_generation(resources):
+    """ Génération des ressources : version du modèle et numéro de chargement (croissant à chaque activation) """
+    return (resources.get("version"), resources.get("generation"))
+
+def _is_older(generation, current):
+    """ Vrai si `generation` a été chargée avant `current` (ressources gardées par un thread pendant un rechargement) """
+    if current is None:
+        return False
+    loads, current_loads = generation[1], current[1]
+    return isinstance(loads, int) and isinstance(current_loads, int) and loads < current_loads
+
+class VerdictCache:
+    """ Verdicts par URL normalisée, avec un niveau hôte optionnel (domaine et liste blanche par hôte).
+        Vidé automatiquement quand une nouvelle version des ressources est activée ; un verdict calculé
+        avec une génération précédente n'y est plus enregistré. """
+
+    def __init__(self, max_urls=MAX_URLS, max_hosts=MAX_HOSTS, ttl=TTL_SECONDS, host_tier=True):
+        self.urls = LRUCache(max_urls, ttl)
+        self.hosts = LRUCache(max_hosts, ttl) if host_tier else None
+        self.generation = None
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "host_hits": 0, "host_misses": 0, "invalidations": 0}
+
+    def bind(self, resources):
+        """ Vider le cache si les ressources (modèle, liste blanche) ont changé depuis le dernier appel.
+            Retourne la génération à passer à put / put_host. """
+        generation = resources_generation(resources)
+        if generation != self.generation:
+            with self.lock:
+                if generation != self.generation and not _is_older(generation, self.generation):
+                    if self.generation is not None:
+                        self.counters["invalidations"] += 1
+                    self.urls.clear()
+                    if self.hosts is not None:
+                        self.hosts.clear()
+                    self.generation = generation
+        return generation
+
+    def get(self, url):
+        """ Verdict mis en cache pour cette URL (copie, avec l'URL demandée), ou None """
+        with self.lock:
+            verdict = self.urls.get(normalize_url(url), time.monotonic())
+            self.counters["hits" if verdict is not None else "misses"] += 1
+        return None if verdict is None else dict(verdict, url=url)
+
+    def put(self, url, verdict, generation=None):
+        """ Mémoriser un verdict, sauf s'il a été calculé avec une autre génération que celle du cache """
+        with self.lock:
+            if generation is None or generation == self.generation:
+                self.urls.put(normalize_url(url), dict(verdict), time.monotonic())
+
+    def get_host(self, host):
+        """ (domaine, en liste blanche) mémorisés pour cet hôte, ou None """
+        if self.hosts is None:
+            return None
+        with self.lock:
+            entry = self.hosts.get(host, time.monotonic())
+            self.counters["host_hits" if entry is not None else "host_misses"] += 1
+        return entry
+
+    def put_host(self, host, domain, allowlisted, generation=None):
+        if self.hosts is not None:
+            with self.lock:
+                if generation is None or generation == self.generation:
+                    self.hosts.put(host, (domain, allowlisted), time.monotonic())
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        host_lookups = self.counters["host_hits"] + self.counters["host_misses"]
+        return dict(
+            self.counters,
+            size=len(self.urls.entries),
+            host_size=len(self.hosts.entries) if self.hosts is not None else 0,
+            evictions=self.urls.evictions + (self.hosts.evictions if self.hosts is not None else 0),
+            expirations=self.urls.expirations + (self.hosts.expirations if self.hosts is not None else 0),
+            hit_rate=self.counters["hits"] / lookups if lookups else 0.0,
+            host_hit_rate=self.counters["host_hits"] / host_lookups if host_lookups else 0.0,
+        )
@@ -1,11 +1,13 @@
 import streamlit as st
-import joblib
-import pandas as pd
-import re
-from urllib.parse import urlparse
-from sklearn.preprocessing import StandardScaler
-import tldextract
+import functools
+import io
 import random
+import threading
+import time
+import pandas as pd
+import Telemetry
+from Predict import OUTPUT_FIELDS, chunked, guess_format, read_urls, score_batch, score_url, verdict_cache
+from Resources import load_resources, metrics as resources_metrics, start_watcher
 
 # Determine initial theme from query parameters
 def get_initial_theme():
@@ -49,10 +51,12 @@ def get_theme_css(theme):
         }
         """
 
-# Comprehensive CSS with theme variables
-st.markdown(f"""
+# Comprehensive CSS with theme variables, construit une seule fois par thème et par processus
+@functools.lru_cache(maxsize=None)
+def get_page_css(theme):
+    return f"""
 <style>
-{get_theme_css(st.session_state.theme)}
+{get_theme_css(theme)}
 
 body {{
     background-color: var(--bg-primary);
@@ -77,7 +81,7 @@ body {{
     padding-bottom: 10px;
 }}
 
-.stButton>button {{
+.stButton>button, .stFormSubmitButton>button {{
     background-color: var(--accent-primary);
     color: white;
     border: none;
@@ -87,7 +91,7 @@ body {{
     margin-top: 10px;
 }}
 
-.stButton>button:hover {{
+.stButton>button:hover, .stFormSubmitButton>button:hover {{
     background-color: var(--accent-secondary);
     transform: scale(1.05);
 }}
@@ -150,38 +154,9 @@ body {{
     color: var(--accent-primary);
 }}
 </style>
-""", unsafe_allow_html=True)
-
-# Charger le modèle et le scaler
-model = joblib.load("model.pkl")
-scaler = joblib.load("scaler.pkl")  
-feature_names = joblib.load("feature_names.pkl")
-
-# Charger la liste des domaines légitimes
-df_legitimate = pd.read_csv("legitimate_urls.csv")
-legitimate_domains = set(df_legitimate["Domain"])
-
-def extract_features(url):
-    """ Fonction pour extraire les caractéristiques d'une URL """
-    features = {}
-    
-    extracted = tldextract.extract(url)
-    domain = f"{extracted.domain}.{extracted.suffix}"
-    
-    if domain in legitimate_domains:
-        print(f"✅ {url} est reconnu comme un site légitime ! 👍")
-        return None
-    
-    features["url_length"] = len(url)  
-    features["has_ip"] = 1 if re.match(r'^\d{1,3}(\.\d{1,3}){3}', url) else 0
-    features["num_dots"] = url.count('.')
-    features["num_hyphens"] = url.count('-')
-    features["num_slashes"] = url.count('/')
-
-    phishing_words = ["secure", "account", "update", "verify", "banking", "free", "login", "password", "paypal", "alert"]
-    features["contains_suspicious_word"] = 1 if any(word in url.lower() for word in phishing_words) else 0
+"""
 
-    return pd.DataFrame([features])
+st.markdown(get_page_css(st.session_state.theme), unsafe_allow_html=True)
 
 # Initialisation des compteurs dans st.session_state
 if 'total_urls_analyzed' not in st.session_state:
@@ -195,24 +170,122 @@ def predict_url(url):
     if not (url.startswith("http://") or url.startswith("https://")):
         return "❌ Veuillez entrer une URL avec http:// ou https://"
     
-    features = extract_features(url)
-    
-    if features is None:
+    result = score_url(url)
+
+    if result["source"].startswith("known_bad:"):
         st.session_state.total_urls_analyzed += 1
-        return "✅ Ce site est légitime ! 👍"
+        st.session_state.phishing_urls_detected += 1
+        return f"⚠️ Site connu comme malveillant ! (source : {result['source'].split(':')[1]} 🚨)"
 
-    features = features[feature_names]
-    features_scaled = scaler.transform(features)
-    prediction = model.predict(features_scaled)[0]
+    if result["allowlisted"]:
+        st.session_state.total_urls_analyzed += 1
+        return "✅ Ce site est légitime ! 👍"
 
     st.session_state.total_urls_analyzed += 1
 
-    if prediction == 1:
+    if result["label"] == 1:
         st.session_state.phishing_urls_detected += 1
         return "⚠️ Site suspect ! (Phishing 🚨)"
     else:
         return "✅ Site sûr ! 👍"
 
+# Analyse en masse : nombre d'URLs par appel à score_batch et rafraîchissement de la progression
+BULK_CHUNK_SIZE = 500
+BULK_REFRESH_SECONDS = 1.0
+
+def read_bulk_urls(uploaded_file, pasted_text):
+    """ URLs d'un fichier envoyé (texte, CSV avec colonne url, JSONL) ou collées, une par ligne """
+    urls = []
+    if uploaded_file is not None:
+        text = uploaded_file.getvalue().decode("utf-8", errors="replace")
+        urls += read_urls(io.StringIO(text), guess_format(uploaded_file.name))
+    if pasted_text:
+        urls += read_urls(io.StringIO(pasted_text), "text")
+    valid = [url for url in urls if url.startswith("http://") or url.startswith("https://")]
+    return valid, len(urls) - len(valid)
+
+def run_bulk_job(job, urls):
+    """ Thread d'analyse : remplit job au fil des lots, la page reste utilisable pendant ce temps """
+    try:
+        for chunk in chunked(urls, BULK_CHUNK_SIZE):
+            if job["cancelled"]:
+                break
+            job["results"].extend(score_batch(chunk))
+            job["done"] += len(chunk)
+            job["elapsed"] = time.perf_counter() - job["start"]
+    except Exception as error:
+        job["error"] = str(error)
+    job["elapsed"] = time.perf_counter() - job["start"]
+    job["finished"] = True
+
+def start_bulk_job(urls):
+    job = {
+        "total": len(urls), "done": 0, "results": [], "start": time.perf_counter(), "elapsed": 0.0,
+        "finished": False, "cancelled": False, "error": None, "counted": False,
+    }
+    threading.Thread(target=run_bulk_job, args=(job, urls), name="bulk-analysis", daemon=True).start()
+    st.session_state.bulk_job = job
+
+def bulk_progress():
+    """ Progression et résultats de l'analyse en masse (fragment relancé seul pendant l'analyse) """
+    job = st.session_state.get("bulk_job")
+    if job is None:
+        return
+
+    rate = job["done"] / job["elapsed"] if job["elapsed"] > 0 else 0.0
+    if not job["finished"]:
+        st.progress(job["done"] / job["total"] if job["total"] else 1.0, text=f"⏳ {job['done']}/{job['total']} URLs analysées, {rate:.0f} URLs/s")
+        if st.button("Arrêter l'analyse"):
+            job["cancelled"] = True
+        return
+
+    if not job["counted"]:
+        # Analyse terminée : mettre à jour les statistiques de la session et sortir du rafraîchissement périodique
+        job["counted"] = True
+        st.session_state.total_urls_analyzed += len(job["results"])
+        st.session_state.phishing_urls_detected += sum(result["label"] for result in job["results"])
+        st.rerun()
+
+    if job["error"]:
+        st.error(f"❌ Analyse interrompue : {job['error']}")
+    st.success(f"✅ {len(job['results'])} URLs analysées en {job['elapsed']:.2f} s ({rate:.0f} URLs/s)")
+
+    df = pd.DataFrame(job["results"], columns=OUTPUT_FIELDS)
+    df["verdict"] = df["label"].map({1: "⚠️ Suspect", 0: "✅ Sûr"}).where(~df["allowlisted"], "✅ Légitime")
+    df.loc[df["source"].str.startswith("known_bad:"), "verdict"] = "🚨 Malveillant connu"
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.download_button(
+        "📥 Télécharger les résultats (CSV)",
+        df.drop(columns=["verdict"]).to_csv(index=False).encode("utf-8"),
+        file_name="resultats_phishing.csv",
+        mime="text/csv",
+    )
+
+def bulk_section():
+    """ Analyse d'une liste d'URLs : fichier envoyé ou texte collé """
+    with st.expander("📂 Analyse en masse (fichier ou liste d'URLs)"):
+        with st.form("bulk_form"):
+            uploaded_file = st.file_uploader("Fichier d'URLs (texte, CSV avec une colonne url, ou JSONL)", type=["txt", "csv", "jsonl"])
+            pasted_text = st.text_area("Ou collez les URLs, une par ligne :")
+            submitted = st.form_submit_button("Analyser la liste")
+
+        job = st.session_state.get("bulk_job")
+        running = job is not None and not job["finished"]
+        if submitted:
+            if running:
+                st.warning("⚠️ Une analyse est déjà en cours.")
+            else:
+                urls, invalid = read_bulk_urls(uploaded_file, pasted_text)
+                if invalid:
+                    st.warning(f"⚠️ {invalid} lignes ignorées (URL sans http:// ou https://).")
+                if urls:
+                    start_bulk_job(urls)
+                    running = True
+                else:
+                    st.warning("⚠️ Aucune URL valide à analyser.")
+
+        st.fragment(bulk_progress, run_every=BULK_REFRESH_SECONDS if running else None)()
+
 # Footer generation functions and styles
 def generate_bubbles(n=20):
     bubbles = []
@@ -226,7 +299,9 @@ def generate_bubbles(n=20):
         bubbles.append(f'<div class="bubble" style="{style}"></div>')
     return "\n".join(bubbles)
 
+@functools.lru_cache(maxsize=1)
 def get_footer_html():
+    """ Pied de page (bulles comprises) généré une seule fois par processus """
     bubbles_html = generate_bubbles(20)
     footer_content = """
 <div class="content">
@@ -360,6 +435,113 @@ footer_css = """
 }
 """
 
+def record_render_time(name, start):
+    """ Temps de rendu côté serveur d'une interaction (page complète ou fragment d'analyse) """
+    st.session_state.setdefault("render_ms", {})[name] = (time.perf_counter() - start) * 1000
+    if Telemetry.is_enabled():
+        Telemetry.lap(f"render_{name}", start, "app")
+
+def stats_cards():
+    """ Cartes de statistiques de la session """
+    # Afficher les résultats d'analyse sous forme de trois cards
+    svg_icon = """
+<svg xmlns="http://www.w3.org/2000/svg" width="40" height="40" fill="#4AB2E1" class="bi bi-diagram-3-fill" viewBox="0 0 16 16">
+    <path fill-rule="evenodd" d="M6 3.5A1.5 1.5 0 0 1 7.5 2h1A1.5 1.5 0 0 1 10 3.5v1A1.5 1.5 0 0 1 8.5 6v1H14a.5.5 0 0 1 .5.5v1a.5.5 0 0 1-1 0V8h-5v.5a.5.5 0 0 1-1 0V8h-5v.5a.5.5 0 0 1-1 0v-1A.5.5 0 0 1 2 7h5.5V6A1.5 1.5 0 0 1 6 4.5zm-6 8A1.5 1.5 0 0 1 1.5 10h1A1.5 1.5 0 0 1 4 11.5v1A1.5 1.5 0 0 1 2.5 14h-1A1.5 1.5 0 0 1 0 12.5zm6 0A1.5 1.5 0 0 1 7.5 10h1a1.5 1.5 0 0 1 1.5 1.5v1A1.5 1.5 0 0 1 8.5 14h-1A1.5 1.5 0 0 1 6 12.5zm6 0a1.5 1.5 0 0 1 1.5-1.5h1a1.5 1.5 0 0 1 1.5 1.5v1a1.5 1.5 0 0 1-1.5 1.5h-1a1.5 1.5 0 0 1-1.5-1.5z"/>
+</svg>
+"""
+    st.markdown(f"""
+    <div style="display: flex; align-items: center; gap: 10px;">
+        {svg_icon} .
+        <h2 style="margin: 0;">Statistiques</h2>
+    </div>
+    """, unsafe_allow_html=True)
+
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="card">
+            <div class="card-title">URLs Analysées</div>
+            <div class="card-content">
+                <p style="font-size: 2em; text-align: center;">{st.session_state.total_urls_analyzed}</p>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="card">
+            <div class="card-title">Sites Suspects</div>
+            <div class="card-content">
+                <p style="font-size: 2em; text-align: center;">{st.session_state.phishing_urls_detected}</p>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        detection_rate = (st.session_state.phishing_urls_detected / st.session_state.total_urls_analyzed) * 100 if st.session_state.total_urls_analyzed > 0 else 0
+        st.markdown(f"""
+        <div class="card">
+            <div class="card-title">Taux de Détection</div>
+            <div class="card-content">
+                <p style="font-size: 2em; text-align: center;">{detection_rate:.2f}%</p>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment
+def analysis_section():
+    """ Analyse d'une URL dans un formulaire : la saisie ne relance rien, la soumission ne réexécute que ce fragment """
+    start = time.perf_counter()
+
+    # Initialisation des états dans st.session_state
+    if 'current_url' not in st.session_state:
+        st.session_state.current_url = ""
+    if 'result' not in st.session_state:
+        st.session_state.result = None
+
+    # Centrer l'input et placer le bouton à droite
+    with st.form("url_form", border=False):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            url_input = st.text_input(
+                "Entrez l'URL à analyser (avec http:// ou https://) :", 
+                placeholder="https://www.example.com",
+                key="url_input"  # Ajouter une clé unique pour suivre les changements
+            )
+        with col2:
+            st.write("")  # Espace vide pour aligner le bouton
+            submitted = st.form_submit_button("Analyser l'URL")
+
+    if submitted:
+        if url_input:
+            with st.spinner("Analyse en cours..."):
+                result = predict_url(url_input)
+                st.session_state.result = result
+                st.session_state.current_url = url_input  # Mettre à jour l'URL courante
+        else:
+            st.session_state.result = None
+            st.warning("⚠️ Veuillez entrer une URL valide.")
+
+    # Afficher le message de résultat uniquement si un résultat existe
+    if st.session_state.result:
+        result_text = st.session_state.result.lower()
+        if "légitime" in result_text or "sûr" in result_text or "valide" in result_text:
+            result_class = "safe"
+            result_icon = "✅"
+        else:
+            result_class = "phishing"
+            result_icon = "⚠️"
+        st.markdown(f"""
+            <div class="result-card {result_class}">
+                <div class="result-icon">{result_icon}</div>
+                <div class="result-text">{st.session_state.result}</div>
+            </div>
+        """, unsafe_allow_html=True)
+
+    stats_cards()
+    record_render_time("analyse", start)
+
 def landing_page():
     # Theme Toggle (inchangé)
     st.sidebar.header("🎨 Thème")
@@ -376,6 +558,24 @@ def landing_page():
         st.query_params.update(theme=new_theme)
         st.rerun()
 
+    # Ressources partagées par le processus ; une nouvelle version est chargée en arrière-plan
+    load_resources()
+    start_watcher()
+    # Mesures par étape si DETECTION_METRICS / DETECTION_METRICS_FILE sont définies
+    Telemetry.configure_from_env()
+
+    # Temps de chargement des ressources (modèle, scaler, domaines légitimes)
+    st.sidebar.caption(
+        f"⏱️ Ressources chargées {resources_metrics['loads']} fois, "
+        f"dernier chargement : {resources_metrics['last_load_seconds']:.2f} s"
+    )
+    st.sidebar.caption(f"🔁 Modèle actif : {resources_metrics['version']}")
+    cache = verdict_cache.stats()
+    st.sidebar.caption(f"🔁 Cache des verdicts : {cache['hit_rate'] * 100:.1f}% de hits ({cache['size']} URLs)")
+    render_ms = st.session_state.get("render_ms")
+    if render_ms:
+        st.sidebar.caption("⏱️ Rendu serveur : " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in render_ms.items()))
+
     # Header (inchangé)
     st.markdown(f"""
     <div style='background: linear-gradient(135deg, var(--gradient-start), var(--gradient-end)); 
@@ -394,36 +594,6 @@ def landing_page():
         <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/4.7.0/css/font-awesome.min.css">
     """, unsafe_allow_html=True)
 
-    # Initialisation des états dans st.session_state
-    if 'current_url' not in st.session_state:
-        st.session_state.current_url = ""
-    if 'result' not in st.session_state:
-        st.session_state.result = None
-
-    # Centrer l'input et placer le bouton à droite
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        url_input = st.text_input(
-            "Entrez l'URL à analyser (avec http:// ou https://) :", 
-            placeholder="https://www.example.com",
-            key="url_input"  # Ajouter une clé unique pour suivre les changements
-        )
-        # Vérifier si l'URL a changé
-        if url_input != st.session_state.current_url:
-            st.session_state.current_url = url_input
-            st.session_state.result = None  # Réinitialiser le résultat
-
-    with col2:
-        st.write("")  # Espace vide pour aligner le bouton
-        if st.button("Analyser l'URL"):
-            if url_input:
-                with st.spinner("Analyse en cours..."):
-                    result = predict_url(url_input)
-                    st.session_state.result = result
-                    st.session_state.current_url = url_input  # Mettre à jour l'URL courante
-            else:
-                st.warning("⚠️ Veuillez entrer une URL valide.")
-
     # Styles pour le message de résultat (inchangés)
     st.markdown("""
     <style>
@@ -488,70 +658,12 @@ def landing_page():
     </style>
     """, unsafe_allow_html=True)
 
-    # Afficher le message de résultat uniquement si un résultat existe
-    if st.session_state.result:
-        result_text = st.session_state.result.lower()
-        if "légitime" in result_text or "sûr" in result_text or "valide" in result_text:
-            result_class = "safe"
-            result_icon = "✅"
-        else:
-            result_class = "phishing"
-            result_icon = "⚠️"
-        st.markdown(f"""
-            <div class="result-card {result_class}">
-                <div class="result-icon">{result_icon}</div>
-                <div class="result-text">{st.session_state.result}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    
-     
-        
-    # Afficher les résultats d'analyse sous forme de trois cards
-    svg_icon = """
-<svg xmlns="http://www.w3.org/2000/svg" width="40" height="40" fill="#4AB2E1" class="bi bi-diagram-3-fill" viewBox="0 0 16 16">
-    <path fill-rule="evenodd" d="M6 3.5A1.5 1.5 0 0 1 7.5 2h1A1.5 1.5 0 0 1 10 3.5v1A1.5 1.5 0 0 1 8.5 6v1H14a.5.5 0 0 1 .5.5v1a.5.5 0 0 1-1 0V8h-5v.5a.5.5 0 0 1-1 0V8h-5v.5a.5.5 0 0 1-1 0v-1A.5.5 0 0 1 2 7h5.5V6A1.5 1.5 0 0 1 6 4.5zm-6 8A1.5 1.5 0 0 1 1.5 10h1A1.5 1.5 0 0 1 4 11.5v1A1.5 1.5 0 0 1 2.5 14h-1A1.5 1.5 0 0 1 0 12.5zm6 0A1.5 1.5 0 0 1 7.5 10h1a1.5 1.5 0 0 1 1.5 1.5v1A1.5 1.5 0 0 1 8.5 14h-1A1.5 1.5 0 0 1 6 12.5zm6 0a1.5 1.5 0 0 1 1.5-1.5h1a1.5 1.5 0 0 1 1.5 1.5v1a1.5 1.5 0 0 1-1.5 1.5h-1a1.5 1.5 0 0 1-1.5-1.5z"/>
-</svg>
-"""
-    st.markdown(f"""
-    <div style="display: flex; align-items: center; gap: 10px;">
-        {svg_icon} .
-        <h2 style="margin: 0;">Statistiques</h2>
-    </div>
-    """, unsafe_allow_html=True)
+    # Analyse d'une URL, résultat et statistiques : fragment réexécuté seul à chaque analyse
+    analysis_section()
+
+    # Analyse en masse, en arrière-plan
+    bulk_section()
 
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="card">
-            <div class="card-title">URLs Analysées</div>
-            <div class="card-content">
-                <p style="font-size: 2em; text-align: center;">{st.session_state.total_urls_analyzed}</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="card">
-            <div class="card-title">Sites Suspects</div>
-            <div class="card-content">
-                <p style="font-size: 2em; text-align: center;">{st.session_state.phishing_urls_detected}</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        detection_rate = (st.session_state.phishing_urls_detected / st.session_state.total_urls_analyzed) * 100 if st.session_state.total_urls_analyzed > 0 else 0
-        st.markdown(f"""
-        <div class="card">
-            <div class="card-title">Taux de Détection</div>
-            <div class="card-content">
-                <p style="font-size: 2em; text-align: center;">{detection_rate:.2f}%</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    
     # Information Section
     svg_icon = """
 <svg xmlns="http://www.w3.org/2000/svg" width="40" height="40" fill="#4AB2E1"  class="bi bi-lightning-charge-fill" viewBox="0 0 16 16">
@@ -611,6 +723,7 @@ def landing_page():
         """, unsafe_allow_html=True)
 
 def main():
+    start = time.perf_counter()
     landing_page()
     st.markdown(f"""
     
@@ -620,6 +733,7 @@ def main():
             {svg_filter}
         {get_footer_html()}
     """, unsafe_allow_html=True)
+    record_render_time("page", start)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file